@@ -0,0 +1,249 @@
+"""Общий для процессов кэш в файле SQLite.
+
+Все WSGI-процессы одного хоста читают и пишут один файл в режиме WAL,
+поэтому инвалидация видна сразу всем, а данные не дублируются в памяти
+каждого процесса.
+
+Защита от «стада» при истечении ключа:
+
+* истёкшее значение ещё STALE_TIMEOUT секунд хранится в таблице;
+  первый читатель захватывает блокировку строки и получает промах,
+  чтобы пересчитать значение, остальные получают старое значение;
+* до истечения ключ может «истечь досрочно» с вероятностью, растущей
+  к концу срока (probabilistic early expiration): время пересчёта
+  delta измеряется между промахом и последующим set().
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    delta REAL NOT NULL DEFAULT 0,
+    locked_until REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID
+'''
+CULL_EVERY = 1000
+MAX_TRACKED_MISSES = 10000
+# SQLITE_MAX_VARIABLE_NUMBER в сборках SQLite до 3.32
+MAX_QUERY_PARAMS = 999
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+def chunks(values, size=MAX_QUERY_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._beta = options.get('EARLY_EXPIRATION_BETA', 1.0)
+        self._stale_timeout = options.get('STALE_TIMEOUT', 60)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+        self._misses = {}
+        self._sets = 0
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _acquire(self, key, now):
+        cursor = self._db.execute(
+            'UPDATE cache SET locked_until = ? '
+            'WHERE key = ? AND locked_until <= ?',
+            (now + self._lock_timeout, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def _resolve(self, key, row, now):
+        """Значение строки или None, если вызывающему нужно пересчитать."""
+        value, expires, delta = row
+        if expires is None:
+            return pickle.loads(value)
+        if now >= expires:
+            if now < expires + self._stale_timeout and not self._acquire(
+                    key, now):
+                return pickle.loads(value)
+            return None
+        if delta and now - delta * self._beta * math.log(
+                1 - random.random()) >= expires and self._acquire(key, now):
+            return None
+        return pickle.loads(value)
+
+    def _miss(self, key):
+        if len(self._misses) > MAX_TRACKED_MISSES:
+            self._misses.clear()
+        self._misses[key] = time.monotonic()
+
+    def _row(self, key, value, timeout):
+        started = self._misses.pop(key, None)
+        delta = time.monotonic() - started if started is not None else 0
+        return (
+            key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout), delta,
+        )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = []
+        for chunk in chunks(keys):
+            rows += self._db.execute(
+                'SELECT key, value, expires, delta FROM cache '
+                f'WHERE key IN ({placeholders(chunk)})',
+                chunk,
+            ).fetchall()
+        found = {}
+        for db_key, *row in rows:
+            value = self._resolve(db_key, row, now)
+            if value is not None:
+                found[keys[db_key]] = value
+        for db_key in keys:
+            if keys[db_key] not in found:
+                self._miss(db_key)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [
+            self._row(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ]
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO cache '
+                '(key, value, expires, delta) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        self._sets += len(rows)
+        if self._sets >= CULL_EVERY:
+            self._sets = 0
+            self._cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._row(self._key(key, version), value, timeout)
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (row[0], time.time()),
+            )
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO cache '
+                '(key, value, expires, delta) VALUES (?, ?, ?, ?)',
+                row,
+            )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            row = self._db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            self._db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        for chunk in chunks(keys):
+            self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                chunk,
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        """Удаляет давно истёкшие строки и лишнее сверх MAX_ENTRIES."""
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute(
+                'DELETE FROM cache WHERE expires <= ?',
+                (time.time() - self._stale_timeout,),
+            )
+            count = self._db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count[0] > self._max_entries:
+                # NULL в SQLite меньше любого числа: бессрочные ключи
+                # (поколения страниц) вытесняются последними
+                self._db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (count[0] // self._cull_frequency,),
+                )
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время жизни потока, как у CONN_MAX_AGE
+        pass
@@ -0,0 +1,66 @@
+"""Настройка соединений SQLite.
+
+Ключ PRAGMAS в описании базы в DATABASES задаёт PRAGMA, которые
+выполняются на каждом новом соединении. В режиме WAL читатели не ждут
+писателя и писатель не ждёт читателей. Ожидание занятой базы настраивать
+не нужно: модуль sqlite3 и так ждёт блокировку 5 секунд (параметр
+timeout, его можно задать в OPTIONS).
+
+copy_database() копирует базу целиком через backup API SQLite: так
+локально поддерживается в актуальном состоянии файл реплики. Время начала
+копирования записывается в таблицу SNAPSHOT_TABLE реплики, по нему
+роутер решает, успела ли реплика получить последние записи.
+"""
+import sqlite3
+import time
+
+from django.db.backends.signals import connection_created
+
+SNAPSHOT_TABLE = 'replica_snapshot'
+
+
+def apply_pragmas(cursor, pragmas):
+    """Выполняет PRAGMA по порядку."""
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+def connect_signals():
+    connection_created.connect(
+        configure_connection, dispatch_uid='core.db.configure_connection'
+    )
+
+
+def copy_database(source, target):
+    """Копирует базу source в target одним согласованным снимком.
+
+    Читатели реплики во время копирования видят либо старые данные, либо
+    новые: страницы target переписываются внутри одной транзакции. Пока
+    время снимка не записано, оно неизвестно и реплика считается
+    отстающей.
+    """
+    source = sqlite3.connect(source, uri=source.startswith('file:'))
+    target = sqlite3.connect(target, uri=target.startswith('file:'))
+    try:
+        # Снимок содержит всё, что записано до начала копирования
+        taken = time.time()
+        source.backup(target)
+        with target:
+            target.execute(
+                f'CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (taken REAL)'
+            )
+            target.execute(f'DELETE FROM {SNAPSHOT_TABLE}')
+            target.execute(
+                f'INSERT INTO {SNAPSHOT_TABLE} VALUES (?)', [taken]
+            )
+    finally:
+        target.close()
+        source.close()
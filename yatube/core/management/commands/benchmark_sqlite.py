@@ -0,0 +1,161 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import ConnectionHandler
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    'id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, pub_date REAL NOT NULL)',
+    'CREATE INDEX post_date_idx ON post (pub_date DESC, id DESC)',
+)
+READ_SQL = 'SELECT id, text FROM post ORDER BY pub_date DESC, id DESC LIMIT 10'
+WRITE_SQL = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+
+
+class Profile:
+    """Описание базы Django и время жизни соединения.
+
+    Соединения открывает бэкенд Django, как в приложении: с timeout
+    модуля sqlite3 (5 секунд ожидания блокировки), PRAGMA foreign_keys
+    и PRAGMAS из описания базы. persistent=False — соединение на каждую
+    операцию, как при CONN_MAX_AGE = 0.
+    """
+
+    def __init__(self, name, database, persistent):
+        self.name = name
+        self.database = database
+        self.persistent = persistent
+
+    def connect(self, path):
+        """Соединение sqlite3, настроенное бэкендом Django."""
+        wrapper = ConnectionHandler({'default': {
+            **self.database, 'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        }})['default']
+        wrapper.connect()
+        return wrapper.connection
+
+
+class Worker(threading.Thread):
+    def __init__(self, profile, path, deadline, write):
+        super().__init__(daemon=True)
+        self.profile = profile
+        self.path = path
+        self.deadline = deadline
+        self.write = write
+        self.operations = 0
+        self.locked = 0
+
+    def run(self):
+        connection = None
+        while time.monotonic() < self.deadline:
+            if connection is None:
+                connection = self.profile.connect(self.path)
+            try:
+                if self.write:
+                    connection.execute(
+                        WRITE_SQL, (1, 'Текст поста', time.time())
+                    )
+                else:
+                    connection.execute(READ_SQL).fetchall()
+                self.operations += 1
+            except sqlite3.OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                self.locked += 1
+            if not self.profile.persistent:
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает соединения Django по умолчанию и с профилем '
+        'SQLITE_PRAGMAS при одновременном чтении и записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность прогона каждого профиля.'
+        )
+        parser.add_argument(
+            '--readers', type=int, default=8, help='Число потоков чтения.'
+        )
+        parser.add_argument(
+            '--writers', type=int, default=2, help='Число потоков записи.'
+        )
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Сколько постов в базе до начала прогона.'
+        )
+
+    def handle(self, *args, **options):
+        profiles = [
+            Profile('default', {}, persistent=False),
+            Profile(
+                'tuned', {'PRAGMAS': settings.SQLITE_PRAGMAS},
+                persistent=True,
+            ),
+        ]
+        directory = tempfile.mkdtemp()
+        try:
+            results = {
+                profile.name: self.measure(profile, directory, options)
+                for profile in profiles
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        for name, (reads, writes, locked) in results.items():
+            self.stdout.write(
+                f'{name}: чтений {reads:.0f}/с, записей {writes:.0f}/с, '
+                f'ошибок блокировки {locked}'
+            )
+        default, tuned = results['default'], results['tuned']
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение чтения: {self.ratio(tuned[0], default[0])}, '
+            f'записи: {self.ratio(tuned[1], default[1])}'
+        ))
+
+    def measure(self, profile, directory, options):
+        path = os.path.join(directory, f'{profile.name}.sqlite3')
+        self.populate(profile.connect(path), options['rows'])
+        deadline = time.monotonic() + options['seconds']
+        workers = [
+            Worker(profile, path, deadline, write=False)
+            for _ in range(options['readers'])
+        ] + [
+            Worker(profile, path, deadline, write=True)
+            for _ in range(options['writers'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        reads = sum(w.operations for w in workers if not w.write)
+        writes = sum(w.operations for w in workers if w.write)
+        locked = sum(w.locked for w in workers)
+        return reads / options['seconds'], writes / options['seconds'], locked
+
+    def populate(self, connection, rows):
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(WRITE_SQL, (
+            (i % 100, f'Пост #{i}', i) for i in range(rows)
+        ))
+        connection.execute('COMMIT')
+        connection.close()
+
+    @staticmethod
+    def ratio(tuned, default):
+        return f'{tuned / default:.1f}x' if default else '—'
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Копирует базу default в файлы SQLite-реплик.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Псевдонимы реплик, по умолчанию DATABASE_REPLICAS.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые столько секунд.'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Не указано ни одной реплики.')
+        source = connections['default'].settings_dict
+        targets = [connections[alias].settings_dict for alias in aliases]
+        for alias, target in zip(aliases, targets):
+            if 'sqlite' not in target['ENGINE']:
+                raise CommandError(f'{alias}: реплика должна быть SQLite.')
+            if target['NAME'] == source['NAME']:
+                raise CommandError(f'{alias}: это та же база, что default.')
+        while True:
+            started = time.monotonic()
+            for alias, target in zip(aliases, targets):
+                copy_database(source['NAME'], target['NAME'])
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{alias}: скопировано')
+            if not options['interval']:
+                break
+            time.sleep(max(
+                0, options['interval'] - (time.monotonic() - started)
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплики обновлены: {", ".join(aliases)}'
+        ))
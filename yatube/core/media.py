@@ -0,0 +1,168 @@
+"""Раздача загруженных файлов из MEDIA_ROOT.
+
+Два режима, MEDIA_OFFLOAD:
+
+* None — файл отдаёт сам Django через FileResponse. WSGI-сервер с
+  wsgi.file_wrapper (gunicorn, uWSGI) отправляет его через sendfile()
+  без копирования в память процесса. Поддерживаются Range, ETag и
+  Last-Modified, поэтому режим годится для бенчмарков без прокси.
+* 'x-accel-redirect' (nginx) или 'x-sendfile' (Apache, lighttpd) —
+  Django только проверяет путь и отдаёт заголовок, а файл, включая
+  диапазоны, отправляет прокси.
+
+Имена загрузок и миниатюр зависят от содержимого, поэтому ответы
+кэшируются надолго и помечаются immutable.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Файл, из которого читается только диапазон байтов.
+
+    fileno() и tell() отдаются как есть: sendfile() в WSGI-сервере
+    начинает с текущей позиции и отправляет Content-Length байтов.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно, None без диапазона, ValueError — 416.
+
+    Несколько диапазонов в одном заголовке не поддерживаются: такой
+    запрос получает файл целиком, как разрешает RFC 7233.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end or not int(end):
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def offload_response(path, full_path):
+    mode = settings.MEDIA_OFFLOAD
+    response = HttpResponse()
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        )
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        raise ValueError(f'Неизвестный режим MEDIA_OFFLOAD: {mode}')
+    # Тип ответа определяет прокси по имени файла
+    del response['Content-Type']
+    return response
+
+
+def file_response(request, full_path, size, etag, last_modified):
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or 'application/octet-stream'
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range and not if_range_matches(request, etag, last_modified):
+        byte_range = None
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            content_type=content_type,
+            status=206,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        info = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404
+    etag = f'"{info.st_size:x}-{info.st_mtime_ns:x}"'
+    last_modified = info.st_mtime
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+    if response is None:
+        if settings.MEDIA_OFFLOAD:
+            response = offload_response(path, full_path)
+        else:
+            response = file_response(
+                request, full_path, info.st_size, etag, last_modified
+            )
+            if response.status_code == 416:
+                return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE,
+        immutable=True,
+    )
+    return response
@@ -0,0 +1,101 @@
+import logging
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .routers import use_replicas
+
+logger = logging.getLogger(__name__)
+# BEGIN, SAVEPOINT и RELEASE от transaction.atomic() ничего не записывают
+WRITE_RE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Следит, чтобы view не выполнял больше запросов, чем разрешено.
+
+    Лимиты задаются в QUERY_BUDGETS по имени маршрута, остальные view
+    получают QUERY_BUDGET_DEFAULT. Превышение пишется в лог, а при
+    QUERY_BUDGET_STRICT = True приводит к исключению. Предназначен
+    для разработки и тестов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        budget = settings.QUERY_BUDGETS.get(
+            match.view_name, settings.QUERY_BUDGET_DEFAULT
+        )
+        response['X-Query-Count'] = counter.count
+        if counter.count > budget:
+            message = (
+                f'{match.view_name}: {counter.count} запросов '
+                f'при лимите {budget} ({request.get_full_path()})'
+            )
+            logger.warning(message)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+        return response
+
+
+class WriteDetector:
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if WRITE_RE.match(sql):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    """Направляет чтение безопасных запросов на реплики базы.
+
+    После запроса, который что-то записал в default, пользователь получает
+    cookie, и на REPLICA_PIN_SECONDS все его запросы читают из default:
+    так он видит свои изменения, пока реплики их не догнали.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        replicas = (
+            request.method in ('GET', 'HEAD')
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        )
+        detector = WriteDetector()
+        with use_replicas(replicas), \
+                connections['default'].execute_wrapper(detector):
+            response = self.get_response(request)
+        if detector.wrote or request.method not in ('GET', 'HEAD'):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return response
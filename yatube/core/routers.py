@@ -0,0 +1,74 @@
+"""Чтение с реплик базы данных.
+
+Запись всегда идёт в default. Чтение уходит на одну из баз
+DATABASE_REPLICAS, только если это разрешено для текущего потока:
+ReplicaMiddleware разрешает его безопасным запросам пользователей, которые
+недавно ничего не записывали. Всё остальное — управляющие команды,
+обработчики сигналов, POST-запросы — читает из default.
+
+Реплика отстаёт от default на время между копированиями. snapshot_time()
+сообщает, когда был снят самый старый из снимков; данные, изменённые
+позже, нужно читать из default.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .db import SNAPSHOT_TABLE
+
+_state = threading.local()
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Разрешает или запрещает чтение с реплик внутри блока."""
+    previous = getattr(_state, 'use_replicas', False)
+    _state.use_replicas = enabled
+    try:
+        yield
+    finally:
+        _state.use_replicas = previous
+
+
+def replicas_enabled():
+    """Пойдёт ли чтение в текущем потоке на реплики."""
+    return bool(settings.DATABASE_REPLICAS) and getattr(
+        _state, 'use_replicas', False
+    )
+
+
+def snapshot_time():
+    """Время самого старого снимка реплик или None, если оно неизвестно."""
+    taken = []
+    for alias in settings.DATABASE_REPLICAS:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(f'SELECT taken FROM {SNAPSHOT_TABLE}')
+                row = cursor.fetchone()
+        except DatabaseError:
+            # Реплику ещё ни разу не копировали
+            return None
+        if row is None:
+            return None
+        taken.append(row[0])
+    return min(taken, default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replicas_enabled():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными из default
+        return db == 'default'
@@ -0,0 +1,74 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Загрузка хэшируется SHA-256 прямо во время записи на диск и сохраняется
+под именем <каталог upload_to>/ab/cd/<sha256>.<расширение>. Одинаковые
+загрузки получают одно и то же имя: второй файл не пишется, а готовые
+миниатюры sorl, привязанные к имени исходника, переиспользуются.
+Шардирование по первым байтам хэша не даёт каталогу разрастись.
+
+Файл может принадлежать нескольким записям, поэтому удалять его можно
+только после подсчёта ссылок (см. posts/blobs.py).
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_NAME_RE = re.compile(r'(^|/)([0-9a-f]{2}/)+[0-9a-f]{64}(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    shard_depth = 2
+
+    def blob_name(self, name, digest):
+        """Имя файла по хэшу: каталог и расширение берутся из name."""
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        shards = [
+            digest[2 * level:2 * level + 2]
+            for level in range(self.shard_depth)
+        ]
+        return '/'.join(
+            [part for part in [directory] if part]
+            + shards + [digest + extension]
+        )
+
+    def is_blob(self, name):
+        return bool(name) and bool(BLOB_NAME_RE.search(name))
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя зависит только от содержимого и выбирается в _save
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            name = self.blob_name(name, digest.hexdigest())
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+                # Свежее время изменения защищает переиспользованный
+                # файл от сборщика мусора, пока пост ещё не сохранён
+                os.utime(full_path)
+                return name
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(temp_path, full_path, allow_overwrite=True)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
@@ -1,7 +1,359 @@
-from django.test import TestCase
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from .cache import SQLiteCache
+from .db import SNAPSHOT_TABLE, copy_database
+from .middleware import QueryBudgetExceeded, ReplicaMiddleware
+from .routers import ReplicaRouter
 
 
 class ViewTestClass(TestCase):
     def test_error_page_404(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetMiddlewareTests(TestCase):
+    def test_query_count_header(self):
+        """Ответ содержит число выполненных запросов."""
+        response = self.client.get('/')
+        self.assertIn('X-Query-Count', response)
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 0})
+    def test_budget_exceeded_raises(self):
+        """Превышение лимита запросов в строгом режиме — ошибка."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Кэш общий для всех процессов, открывших один файл."""
+        other = self.make_cache()
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_and_get_many(self):
+        """add, incr и get_many работают атомарно и по-джанговски."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('other', 'x')
+        self.assertEqual(
+            self.cache.get_many(['counter', 'other', 'missing']),
+            {'counter': 3, 'other': 'x'},
+        )
+
+    def test_expired_key_is_recomputed_by_one_reader(self):
+        """Истёкший ключ пересчитывает один читатель, другие видят старое."""
+        self.cache.set('page', 'old', timeout=-1)
+        first, second = self.make_cache(), self.make_cache()
+        self.assertIsNone(first.get('page'))
+        self.assertEqual(second.get('page'), 'old')
+        first.set('page', 'new')
+        self.assertEqual(second.get('page'), 'new')
+
+    def test_expired_key_after_stale_timeout_is_missing(self):
+        """После STALE_TIMEOUT истёкшее значение не отдаётся."""
+        cache = self.make_cache(STALE_TIMEOUT=0)
+        cache.set('page', 'old', timeout=-1)
+        self.assertIsNone(cache.get('page'))
+        self.assertIsNone(self.make_cache(STALE_TIMEOUT=0).get('page'))
+
+    def test_many_keys_fit_query_parameters(self):
+        """get_many и delete_many принимают больше ключей, чем параметров."""
+        cache = self.make_cache(MAX_ENTRIES=5000)
+        data = {f'key:{i}': i for i in range(2500)}
+        cache.set_many(data)
+        self.assertEqual(cache.get_many(list(data)), data)
+        cache.delete_many(list(data))
+        self.assertEqual(cache.get_many(list(data)), {})
+
+    def test_cull_keeps_keys_without_expiry(self):
+        """При вытеснении бессрочные ключи удаляются последними."""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set_many({f'generation:{i}': i for i in range(5)}, None)
+        cache.set_many({f'page:{i}': i for i in range(10)}, 60)
+        cache._cull()
+        self.assertEqual(
+            len(cache.get_many([f'generation:{i}' for i in range(5)])), 5
+        )
+        self.assertEqual(
+            len(cache.get_many([f'page:{i}' for i in range(10)])), 3
+        )
+
+
+class MediaServeTests(TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'posts'))
+        with open(os.path.join(self.directory, 'posts', 'a.gif'), 'wb') as f:
+            f.write(self.content)
+        self.settings = override_settings(MEDIA_ROOT=self.directory)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get(self, path='/media/posts/a.gif', **headers):
+        return self.client.get(path, **headers)
+
+    def test_file_served_with_cache_headers(self):
+        """Файл отдаётся целиком с долгим кэшированием и ETag."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('ETag', response)
+
+    def test_range_request(self):
+        """Запрос с Range получает 206 и только нужные байты."""
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[10:20]
+        )
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        suffix = self.get(HTTP_RANGE='bytes=-4')
+        self.assertEqual(
+            b''.join(suffix.streaming_content), self.content[-4:]
+        )
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла — 416."""
+        response = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_returns_whole_file(self):
+        """Устаревший If-Range отдаёт файл целиком."""
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_request(self):
+        """Совпавший ETag даёт 304 без тела."""
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_paths(self):
+        """Несуществующие файлы и пути за MEDIA_ROOT — 404."""
+        self.assertEqual(self.get('/media/posts/none.gif').status_code, 404)
+        self.assertEqual(self.get('/media/posts/').status_code, 404)
+        self.assertEqual(
+            self.get('/media/../settings.py').status_code, 404
+        )
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """В режиме прокси Django отдаёт только заголовок."""
+        response = self.get()
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/a.gif'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        """X-Sendfile содержит полный путь к файлу."""
+        response = self.get()
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.directory, 'posts', 'a.gif'),
+        )
+
+
+class SQLitePragmaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, **database):
+        connection = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            **database,
+        }})['default']
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connection(self):
+        """PRAGMA из описания базы применяются к каждому соединению."""
+        connection = self.connect(PRAGMAS=settings.SQLITE_PRAGMAS)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+
+    def test_no_pragmas_by_default(self):
+        """Без ключа PRAGMAS соединение остаётся с настройками SQLite."""
+        connection = self.connect()
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+        # Ожидание блокировки задаёт timeout модуля sqlite3, а не PRAGMAS
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+
+    def test_benchmark_command(self):
+        """Бенчмарк сравнивает оба профиля и печатает ускорение."""
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', '--seconds=0.2', '--readers=2',
+            '--writers=1', '--rows=100', stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn('default:', output)
+        self.assertIn('tuned:', output)
+        self.assertIn('Ускорение чтения', output)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def read_db(self, request, write=False):
+        """База, из которой view прочитал бы данные, и ответ middleware."""
+        used = []
+
+        def view(request):
+            if write:
+                get_user_model().objects.create(username='writer')
+            used.append(self.router.db_for_read(get_user_model()))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return used[0], response
+
+    def test_safe_requests_read_from_replica(self):
+        """GET читает с реплики и не закрепляет пользователя за default."""
+        db, response = self.read_db(self.factory.get('/'))
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_post_reads_primary_and_pins(self):
+        """POST читает из default и ставит cookie для своих изменений."""
+        db, response = self.read_db(self.factory.post('/'))
+        self.assertEqual(db, 'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_pinned_user_reads_primary(self):
+        """После своей записи пользователь читает из default."""
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        db, _ = self.read_db(request)
+        self.assertEqual(db, 'default')
+
+    def test_get_with_write_pins(self):
+        """GET, который что-то записал, тоже закрепляет пользователя."""
+        _, response = self.read_db(self.factory.get('/'), write=True)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_read_only_transaction_does_not_pin(self):
+        """BEGIN и SAVEPOINT читающей транзакции не закрепляют за default."""
+        def view(request):
+            with transaction.atomic():
+                list(get_user_model().objects.using('default'))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(self.factory.get('/'))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_outside_requests_read_primary(self):
+        """Вне запросов чтение и запись идут в default."""
+        self.assertEqual(self.router.db_for_read(get_user_model()), 'default')
+        self.assertEqual(
+            self.router.db_for_write(get_user_model()), 'default'
+        )
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик всё читается из default и cookie не ставится."""
+        db, response = self.read_db(self.factory.post('/'))
+        self.assertEqual(db, 'default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class ReplicateCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'db.sqlite3')
+        self.target = os.path.join(self.directory, 'db.replica.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_copy_database(self):
+        """Реплика получает схему и данные основной базы."""
+        connection = sqlite3.connect(self.source)
+        connection.execute('CREATE TABLE post (text TEXT)')
+        connection.execute("INSERT INTO post VALUES ('Тестовый пост')")
+        connection.commit()
+        copy_database(self.source, self.target)
+        connection.execute("INSERT INTO post VALUES ('Новый пост')")
+        connection.commit()
+        connection.close()
+        replica = sqlite3.connect(self.target)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT text FROM post').fetchall(),
+            [('Тестовый пост',)],
+        )
+
+    def test_copy_records_snapshot_time(self):
+        """Реплика хранит время, на которое снят её снимок."""
+        sqlite3.connect(self.source).close()
+        before = time.time()
+        copy_database(self.source, self.target)
+        replica = sqlite3.connect(self.target)
+        self.addCleanup(replica.close)
+        (taken,), = replica.execute(
+            f'SELECT taken FROM {SNAPSHOT_TABLE}'
+        ).fetchall()
+        self.assertGreaterEqual(taken, before)
+        self.assertLessEqual(taken, time.time())
+
+    def test_refuses_to_copy_onto_primary(self):
+        """Команда не копирует базу саму в себя."""
+        with self.assertRaises(CommandError):
+            call_command('replicate_db', 'replica', stdout=StringIO())
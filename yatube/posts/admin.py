@@ -1,10 +1,24 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
+class FullTextSearchMixin:
+    """Поиск в админке через индекс FTS5 вместо LIKE '%...%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.match_expression(search_term) or not (
+            search.is_supported(queryset.db)
+        ):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.matching(queryset, search_term), False
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
@@ -17,8 +31,9 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('author', 'text', 'post', 'created',)
+    search_fields = ('text',)
 
 
 @admin.register(Follow)
@@ -0,0 +1,103 @@
+"""Подсчёт ссылок на файлы картинок постов.
+
+Хранилище с адресацией по содержимому отдаёт одно имя файла всем
+одинаковым загрузкам, поэтому файл удаляется только когда на него не
+ссылается ни один пост. Счётчики меняются сигналами на Post через
+F()-выражения; расхождения исправляет recount().
+"""
+import logging
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def add_reference(name):
+    if not name:
+        return
+    updated = ImageBlob.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, references=1)
+    except IntegrityError:
+        add_reference(name)
+
+
+def delete_file(name):
+    """Удаляет файл и все его миниатюры, если на него снова не сослались.
+
+    Пока файл удаляется, строка ImageBlob с нулём ссылок заблокирована:
+    add_reference() того же имени ждёт конца транзакции и затем создаёт
+    запись заново, а не теряет ссылку на удалённый файл.
+    """
+    with transaction.atomic():
+        blob, _ = ImageBlob.objects.select_for_update().get_or_create(
+            name=name
+        )
+        if blob.references:
+            return
+        try:
+            delete_thumbnails(ImageFile(name, storage()))
+        except Exception:
+            logger.exception('Не удалось удалить файл %s', name)
+        blob.delete()
+
+
+def release(name):
+    """Снимает ссылку; файл без ссылок удаляется после фиксации транзакции.
+
+    Удаляются только файлы хранилища с адресацией по содержимому: старые
+    загрузки и внешние имена остаются на месте.
+    """
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    deleted, _ = ImageBlob.objects.filter(name=name, references=0).delete()
+    if deleted and storage().is_blob(name):
+        transaction.on_commit(lambda: delete_file(name))
+
+
+def recount():
+    """Пересчитывает ссылки по таблице постов, возвращает число правок.
+
+    Два запроса над целыми таблицами: UPDATE расходящихся счётчиков и
+    INSERT ... SELECT для файлов, у которых ещё нет записи.
+    """
+    actual = Coalesce(Subquery(
+        Post.objects.filter(image=OuterRef('name')).order_by().values(
+            'image'
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+    repaired = ImageBlob.objects.exclude(references=actual).update(
+        references=actual
+    )
+    missing = Post.objects.exclude(image='').exclude(
+        image__in=ImageBlob.objects.values('name')
+    ).order_by().values('image').annotate(
+        total=Count('pk')
+    ).values_list('image', 'total')
+    sql, params = missing.query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ImageBlob._meta.db_table)} '
+            f'({quote("name")}, {quote("references")}) {sql}',
+            params,
+        )
+        return repaired + cursor.rowcount
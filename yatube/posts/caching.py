@@ -0,0 +1,191 @@
+"""Кэш страниц с инвалидацией по поколениям.
+
+Ключ закэшированной страницы включает номер поколения её области
+('posts', 'group:<slug>', 'author:<username>'). Запись в Post, Group
+или Follow увеличивает поколение, и следующие запросы читают уже
+новый ключ. Поэтому страницы можно хранить долго и при этом сразу
+видеть изменения; старые ключи просто истекают по таймауту.
+
+Вместе с поколением запоминается время изменения области. Страница
+читается с реплик, только если их снимок сделан позже этого времени:
+иначе ETag или кэш нового поколения достались бы копии со старыми
+данными.
+"""
+import random
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+from core.routers import replicas_enabled, snapshot_time, use_replicas
+
+from .models import Group
+
+User = get_user_model()
+
+GENERATION_KEY = 'generation:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def scope_hash(scope):
+    # Имена пользователей и slug групп могут содержать символы,
+    # недопустимые в ключах memcached
+    return md5(scope.encode()).hexdigest()
+
+
+def generation_key(scope):
+    return GENERATION_KEY.format(scope_hash(scope))
+
+
+def modified_key(scope):
+    return MODIFIED_KEY.format(scope_hash(scope))
+
+
+def new_generation():
+    # Поколение, которое не совпадёт с уже вытесненными из кэша
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, new_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(*scopes):
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, new_generation(), None)
+    touch_modified(scopes)
+    if connection.in_atomic_block:
+        # Снимок, снятый до фиксации транзакции, её записей не содержит
+        transaction.on_commit(lambda: touch_modified(scopes))
+
+
+def touch_modified(scopes):
+    now = time.time()
+    cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def modified_time(scopes):
+    """Время последнего изменения областей или None, если оно неизвестно."""
+    keys = [modified_key(scope) for scope in scopes]
+    modified = cache.get_many(keys)
+    if not keys or len(modified) != len(keys):
+        return None
+    return max(modified.values())
+
+
+def get_last_modified(scopes):
+    modified = modified_time(scopes)
+    if modified is None:
+        return None
+    return datetime.fromtimestamp(modified, timezone.utc)
+
+
+def read_fresh_replicas(scopes):
+    """Читает страницу с реплик, только если они новее её областей.
+
+    Без реплик или для закреплённого за default пользователя ничего не
+    проверяется.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not replicas_enabled():
+                return view(request, *args, **kwargs)
+            modified = modified_time(scopes(*args, **kwargs))
+            taken = snapshot_time()
+            fresh = None not in (modified, taken) and modified < taken
+            with use_replicas(fresh):
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def page_scopes(author_ids=(), group_ids=()):
+    """Области страниц авторов и групп по их id."""
+    usernames = User.objects.filter(pk__in=author_ids).values_list(
+        'username', flat=True
+    )
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    return (
+        [f'author:{username}' for username in usernames]
+        + [f'group:{slug}' for slug in slugs]
+    )
+
+
+def conditional_page(scopes):
+    """condition() с валидаторами по поколениям областей страницы.
+
+    ETag считается по поколениям, пользователю и адресу страницы ещё до
+    выборки постов и рендеринга, поэтому ответ 304 почти ничего не стоит.
+    Last-Modified отдаётся только
+    анонимам: страница вошедшего пользователя меняется и без записи в
+    области. Вошедший пользователь видит формы с CSRF-токеном, поэтому
+    ETag включает и секрет CSRF: после его смены старая копия страницы
+    не подходит.
+    """
+    def etag(request, *args, **kwargs):
+        user = request.user
+        parts = get_generations(scopes(*args, **kwargs)) + [
+            user.pk if user.is_authenticated else 'anonymous',
+            request.get_full_path(),
+        ]
+        if user.is_authenticated:
+            # get_token() заводит секрет, если cookie ещё нет, и ответ
+            # установит ту же cookie, по которой считан ETag
+            get_token(request)
+            parts.append(request.META['CSRF_COOKIE'])
+        return md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return get_last_modified(scopes(*args, **kwargs))
+
+    def decorator(view):
+        return read_fresh_replicas(scopes)(condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view))
+    return decorator
+
+
+def cache_page_by_generation(scopes, key_prefix, timeout=None):
+    """Аналог cache_page, ключ которого зависит от поколений областей.
+
+    scopes(*args, **kwargs) получает аргументы view и возвращает список
+    областей страницы. К таймауту добавляется случайная прибавка до 10%,
+    чтобы страницы не истекали одновременно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            generations = get_generations(scopes(*args, **kwargs))
+            prefix = '.'.join(
+                [key_prefix] + [str(generation) for generation in generations]
+            )
+            page_timeout = timeout or settings.PAGE_CACHE_TIMEOUT
+            page_timeout += random.randint(0, page_timeout // 10)
+            return cache_page(page_timeout, key_prefix=prefix)(view)(
+                request, *args, **kwargs
+            )
+        return read_fresh_replicas(scopes)(wrapper)
+    return decorator
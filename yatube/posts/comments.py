@@ -0,0 +1,52 @@
+"""Комментарии к посту: страницы по курсору и счётчик на посте.
+
+Комментарии идут от старых к новым страницами по COMMENTS_PER_PAGE;
+страница выбирается по (created, pk) через индекс (post, created),
+поэтому пост с тысячами комментариев открывается так же быстро,
+как пост без них. Post.comment_count меняют сигналы Comment,
+расхождения исправляет команда recount_comments.
+"""
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Post
+from .paginators import CursorPaginator
+
+
+def comment_page(post, cursor=None):
+    """Страница комментариев после курсора с авторами одним запросом."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=post).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'pk'),
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+def serialize(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def adjust(post_id, delta):
+    rows = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        rows = rows.filter(comment_count__gte=-delta)
+    rows.update(comment_count=F('comment_count') + delta)
+
+
+def recount():
+    """Сверяет счётчики с таблицей комментариев, возвращает число правок."""
+    actual = Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+            'post'
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+    return Post.objects.exclude(comment_count=actual).update(
+        comment_count=actual
+    )
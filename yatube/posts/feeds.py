@@ -0,0 +1,177 @@
+"""Движки ленты подписок.
+
+Движок выбирается настройкой FOLLOW_FEED_ENGINE:
+
+* ``timeline`` — материализованная лента (см. posts.timeline);
+* ``merge`` — k-way слияние закэшированных списков постов авторов;
+* ``sql`` — соединение posts_post с posts_follow при каждом запросе.
+"""
+import heapq
+from itertools import dropwhile, islice, takewhile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime
+
+from .models import Follow, Post
+from .paginators import CursorPaginator, paginate
+from .timeline import TimelinePaginator, timeline_for
+
+AUTHOR_POSTS_KEY = 'author_posts:{}'
+
+
+def author_posts_key(author_id):
+    return AUTHOR_POSTS_KEY.format(author_id)
+
+
+def invalidate_author_posts(author_id):
+    cache.delete(author_posts_key(author_id))
+
+
+def fetch_author_posts(author_ids):
+    """Последние посты каждого автора одним запросом на пачку авторов.
+
+    ROW_NUMBER() по автору оставляет не больше AUTHOR_POSTS_CACHE_SIZE
+    постов на каждого, так что подписка на тысячи авторов не
+    превращается в тысячи запросов.
+    """
+    posts = {author_id: [] for author_id in author_ids}
+    # Число авторов в IN (...) ограничено числом параметров запроса
+    chunk = (connection.features.max_query_params or 999) - 1
+    for start in range(0, len(author_ids), chunk):
+        ranked = Post.objects.filter(
+            author_id__in=author_ids[start:start + chunk],
+            thumbnails_ready=True,
+        ).annotate(rank=Window(
+            RowNumber(), partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('pk').desc()],
+        )).order_by().values_list('pk', 'author_id', 'pub_date', 'rank')
+        sql, params = ranked.query.sql_with_params()
+        rows = Post.objects.raw(
+            f'SELECT id, author_id, pub_date FROM ({sql}) ranked '
+            'WHERE rank <= %s',
+            (*params, settings.AUTHOR_POSTS_CACHE_SIZE),
+        )
+        for post in rows:
+            posts[post.author_id].append((post.pub_date, post.pk))
+    for entries in posts.values():
+        entries.sort(reverse=True)
+    return posts
+
+
+def get_author_posts(author_ids):
+    """Списки (pub_date, id) последних постов авторов, новые первыми.
+
+    Длина каждого списка ограничена AUTHOR_POSTS_CACHE_SIZE, поэтому
+    лента глубже этого числа постов одного автора не уходит.
+    """
+    keys = {author_posts_key(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    fetched = fetch_author_posts([
+        author_id for key, author_id in keys.items() if key not in cached
+    ])
+    if fetched:
+        missing = {
+            author_posts_key(author_id): posts
+            for author_id, posts in fetched.items()
+        }
+        cache.set_many(missing)
+        cached.update(missing)
+    return [posts for posts in cached.values() if posts]
+
+
+class MergedFeed:
+    """Ленивая последовательность постов, слитая из списков авторов.
+
+    Поддерживает len() и срезы, поэтому подходит и для обычного
+    Paginator в режиме ?page=N.
+    """
+
+    def __init__(self, author_ids):
+        self.lists = get_author_posts(author_ids)
+
+    def __len__(self):
+        return sum(len(posts) for posts in self.lists)
+
+    def after(self, position=None):
+        tails = self.lists
+        if position is not None:
+            tails = [
+                dropwhile(lambda entry: entry >= position, posts)
+                for posts in self.lists
+            ]
+        return heapq.merge(*tails, reverse=True)
+
+    def before(self, position):
+        heads = [
+            reversed(list(takewhile(lambda entry: entry > position, posts)))
+            for posts in self.lists
+        ]
+        return heapq.merge(*heads)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(islice(self.after(), index.start, index.stop))
+        return next(islice(self.after(), index, None))
+
+
+class MergeFeedPaginator(CursorPaginator):
+    """Курсорный пагинатор поверх MergedFeed.
+
+    Слияние идёт через кучу и останавливается, как только набрана
+    страница; посты страницы затем читаются одним запросом по id.
+    """
+
+    def to_position(self, values):
+        return parse_datetime(values[0]), int(values[1])
+
+    def position_of(self, entry):
+        return entry
+
+    def fetch(self, position, backwards, limit):
+        if backwards:
+            entries = self.object_list.before(position)
+        else:
+            entries = self.object_list.after(position)
+        return list(islice(entries, limit))
+
+    def _get_page(self, object_list, *args, **kwargs):
+        ids = [post_id for _, post_id in object_list]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return super()._get_page(
+            [posts[post_id] for post_id in ids if post_id in posts],
+            *args, **kwargs
+        )
+
+
+def follow_page(request):
+    """Страница ленты подписок выбранным в настройках движком."""
+    engine = settings.FOLLOW_FEED_ENGINE
+    user = request.user
+    count_scope = f'follow:{user.pk}'
+    if engine == 'timeline':
+        return paginate(
+            request, timeline_for(user), TimelinePaginator,
+            count_scope=count_scope
+        )
+    if engine == 'merge':
+        author_ids = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        )
+        return paginate(
+            request, MergedFeed(list(author_ids)), MergeFeedPaginator,
+            count_scope=count_scope
+        )
+    if engine == 'sql':
+        return paginate(
+            request,
+            Post.objects.filter(
+                author__following__user=user, thumbnails_ready=True
+            ).select_related('author', 'group'),
+            count_scope=count_scope
+        )
+    raise ValueError(f'Неизвестный движок ленты: {engine}')
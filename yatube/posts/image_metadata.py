@@ -0,0 +1,68 @@
+"""Размеры и заглушка картинки поста.
+
+Ширина, высота, размер файла и средний цвет картинки считаются один раз
+при загрузке и хранятся в полях Post, поэтому шаблоны выводят блок
+нужного размера с цветной заглушкой, не открывая файл. Для старых
+записей поля заполняет команда backfill_image_metadata.
+"""
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EMPTY_METADATA = {
+    'image_width': None,
+    'image_height': None,
+    'image_size': None,
+    'image_placeholder': '',
+}
+# Значения EXIF Orientation, при которых картинка повёрнута на 90°
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+PLACEHOLDER_SAMPLE = (64, 64)
+
+
+def _read(file):
+    file.seek(0)
+    with Image.open(file) as source:
+        width, height = source.size
+        orientation = source.getexif().get(0x0112)
+        source.draft('RGB', PLACEHOLDER_SAMPLE)
+        red, green, blue = source.convert('RGB').resize(
+            (1, 1), Image.BOX
+        ).getpixel((0, 0))
+    file.seek(0)
+    if orientation in ROTATED_ORIENTATIONS:
+        width, height = height, width
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file.size,
+        'image_placeholder': f'#{red:02x}{green:02x}{blue:02x}',
+    }
+
+
+def read_metadata(image):
+    """Поля метаданных для файла картинки или EMPTY_METADATA при ошибке.
+
+    image — FieldFile поста: ещё не сохранённая загрузка читается из
+    памяти или временного файла, сохранённая — из хранилища.
+    """
+    if not image:
+        return dict(EMPTY_METADATA)
+    try:
+        if not image._committed:
+            return _read(image.file)
+        with image.storage.open(image.name, 'rb') as file:
+            return _read(file)
+    except Exception:
+        logger.warning('Не удалось прочитать картинку %s', image.name)
+        return dict(EMPTY_METADATA)
+
+
+def apply_metadata(post):
+    """Обновляет метаданные поста, если картинка сменилась."""
+    if post.image.name == getattr(post, 'loaded_image', None):
+        return
+    for field, value in read_metadata(post.image).items():
+        setattr(post, field, value)
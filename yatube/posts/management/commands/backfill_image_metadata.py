@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.image_metadata import read_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, вес и цвет заглушки картинок у постов, '
+        'для которых они ещё не посчитаны.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать метаданные всех картинок.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(image_width__isnull=True)
+        names = posts.order_by().values_list('image', flat=True).distinct()
+        updated = failed = 0
+        for name in list(names):
+            metadata = read_metadata(Post(image=name).image)
+            if metadata['image_width'] is None:
+                failed += 1
+                continue
+            updated += Post.objects.filter(image=name).update(**metadata)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {updated}, не прочитано файлов: {failed}'
+        ))
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, '
+        'и миниатюры, о которых не знает KV-хранилище sorl.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько имён сверять с базой за один запрос.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 60 * 60,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        min_age = timedelta(seconds=options['min_age'])
+        images = self.collect(
+            media_gc.orphaned_images(options['batch_size'], min_age),
+            media_gc.delete_image, options['dry_run'],
+        )
+        thumbnails = self.collect(
+            media_gc.orphaned_thumbnails(options['batch_size'], min_age),
+            media_gc.delete_thumbnail, options['dry_run'],
+        )
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} картинок: {images}, миниатюр: {thumbnails}'
+        ))
+
+    def collect(self, orphans, delete, dry_run):
+        count = 0
+        for batch in orphans:
+            for name in batch:
+                if dry_run or delete(name):
+                    count += 1
+                    if self.verbosity > 1:
+                        self.stdout.write(name)
+        return count
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON, читая таблицы порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию стандартный вывод.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            counts = export(self.stdout, options['chunk_size'])
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as stream:
+                counts = export(stream, options['chunk_size'])
+        summary = ', '.join(
+            f'{name}: {count}' for name, count in counts.items()
+        )
+        self.stderr.write(self.style.SUCCESS(f'Выгружено {summary}'))
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.synthetic import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт воспроизводимый синтетический набор пользователей, '
+        'постов, подписок и комментариев для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000, help='Число пользователей.'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=10000, help='Число постов.'
+        )
+        parser.add_argument(
+            '--groups', type=int, default=100, help='Число групп.'
+        )
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--comments', type=float, default=3,
+            help='Среднее число комментариев к посту.'
+        )
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок создать в хранилище.'
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.2,
+            help='Доля постов с картинкой, если картинки есть.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты.'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Зерно генератора.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько объектов вставлять одним запросом.'
+        )
+        parser.add_argument(
+            '--locale', default='ru_RU', help='Локаль Faker для текстов.'
+        )
+        parser.add_argument(
+            '--no-timelines', action='store_false', dest='timelines',
+            help='Не собирать ленты подписок (для движков merge и sql).'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if options['days'] < 1:
+            raise CommandError('--days должен быть положительным.')
+        started = time.monotonic()
+        counts = DatasetGenerator(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            comments=options['comments'],
+            images=options['images'],
+            image_ratio=options['image_ratio'],
+            days=options['days'],
+            zipf=options['zipf'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            locale=options['locale'],
+            timelines=options['timelines'],
+        ).generate()
+        summary = ', '.join(
+            f'{name}: {count}' for name, count in counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {summary} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import process_image
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры и варианты srcset для картинок уже '
+        'сохранённых постов и показывает в лентах посты, миниатюры '
+        'которых фоновый пул создать не смог.'
+    )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        count = 0
+        for image_name in images.iterator():
+            process_image(image_name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {count}'))
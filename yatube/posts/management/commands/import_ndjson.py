@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON из export_ndjson пачками через bulk_create и '
+        'пересобирает счётчики, ленты и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для загрузки; по умолчанию стандартный ввод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько объектов вставлять одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'])
+        if options['path'] == '-':
+            counts = importer.load(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as stream:
+                counts = importer.load(stream)
+        summary = ', '.join(
+            f'{name}: {count}' for name, count in counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Загружено {summary}'))
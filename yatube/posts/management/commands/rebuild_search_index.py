@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import install
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default', help='Псевдоним базы данных.'
+        )
+
+    def handle(self, *args, **options):
+        install(options['database'], rebuild=True)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.stats import rebuild, reconcile
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики авторов и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи для сверки; по умолчанию — все.'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересобрать счётчики всех пользователей одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild()
+            self.stdout.write(self.style.SUCCESS('Счётчики пересобраны'))
+            return
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        repaired = reconcile(users.values_list('pk', flat=True).iterator())
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено записей: {repaired}'
+        ))
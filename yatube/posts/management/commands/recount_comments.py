@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.comments import recount
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики комментариев постов с таблицей комментариев.'
+
+    def handle(self, *args, **options):
+        repaired = recount()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено постов: {repaired}'))
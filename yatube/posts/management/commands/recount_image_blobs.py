@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import recount
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики ссылок на файлы картинок с таблицей постов.'
+
+    def handle(self, *args, **options):
+        repaired = recount()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено файлов: {repaired}'))
@@ -0,0 +1,95 @@
+"""Поиск файлов картинок и миниатюр, на которые никто не ссылается.
+
+Каталоги хранилища обходятся по одному, имена файлов сверяются с
+таблицами пачками, поэтому ни список файлов, ни таблица постов целиком
+в память не загружаются.
+
+* Картинка — сирота, если ни один Post.image не ссылается на её имя.
+  Вместе с ней удаляются её миниатюры и записи KV-хранилища sorl.
+* Миниатюра — сирота, если о ней нет записи в KV-хранилище sorl.
+
+Файлы моложе min_age не трогаются: пост с только что загруженной
+картинкой мог ещё не сохраниться.
+"""
+import posixpath
+from itertools import islice
+
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import blobs
+from .models import ImageBlob, Post
+
+
+def walk(storage, directory):
+    """Имена всех файлов каталога хранилища, каталог за каталогом."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_old(storage, name, min_age):
+    return timezone.now() - storage.get_modified_time(name) >= min_age
+
+
+def orphaned_images(batch_size, min_age):
+    """Пачки имён картинок, на которые не ссылается ни один пост."""
+    storage = blobs.storage()
+    directory = Post._meta.get_field('image').upload_to.rstrip('/')
+    for batch in batches(walk(storage, directory), batch_size):
+        referenced = set(Post.objects.filter(image__in=batch).values_list(
+            'image', flat=True
+        ))
+        yield [
+            name for name in batch
+            if name not in referenced and is_old(storage, name, min_age)
+        ]
+
+
+def orphaned_thumbnails(batch_size, min_age):
+    """Пачки имён миниатюр, которых нет в KV-хранилище sorl."""
+    storage = default.storage
+    directory = sorl_settings.THUMBNAIL_PREFIX.rstrip('/')
+    for batch in batches(walk(storage, directory), batch_size):
+        keys = {
+            add_prefix(ImageFile(name, storage).key): name for name in batch
+        }
+        registered = set(KVStoreModel.objects.filter(
+            key__in=list(keys)
+        ).values_list('key', flat=True))
+        yield [
+            name for key, name in keys.items()
+            if key not in registered and is_old(storage, name, min_age)
+        ]
+
+
+def delete_image(name):
+    """Удаляет картинку и её миниатюры, если на неё так и не сослались."""
+    if Post.objects.filter(image=name).exists():
+        return False
+    ImageBlob.objects.filter(name=name).delete()
+    delete_thumbnails(ImageFile(name, blobs.storage()))
+    return True
+
+
+def delete_thumbnail(name):
+    default.storage.delete(name)
+    return True
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:55
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+import django.db.models.expressions
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет первую подписку каждой пары и убирает подписки на себя.
+
+    Счётчики подписок затронутых пользователей пересчитываются.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    affected = set()
+    self_follows = Follow.objects.filter(user=F('author'))
+    affected.update(self_follows.values_list('user_id', flat=True))
+    self_follows.delete()
+    duplicates = Follow.objects.order_by().values(
+        'user_id', 'author_id'
+    ).annotate(first_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for row in list(duplicates):
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(id=row['first_id']).delete()
+        affected.update([row['user_id'], row['author_id']])
+    for user_id in affected:
+        AuthorStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_author_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='follow_not_self'),
+        ),
+    ]
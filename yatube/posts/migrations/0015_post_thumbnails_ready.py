@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_date_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=True, editable=False, help_text='Пост с новой картинкой попадает в ленты, когда фоновый пул создаст её миниатюры', verbose_name='Миниатюры готовы'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['thumbnails_ready', '-pub_date', '-id'], name='post_ready_date_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -40,15 +42,85 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True
+    )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки', null=True, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        verbose_name='Размер файла', null=True, blank=True, editable=False
+    )
+    image_placeholder = models.CharField(
+        verbose_name='Цвет заглушки',
+        max_length=7,
+        blank=True,
+        editable=False,
+        help_text='Средний цвет картинки в виде #rrggbb'
+    )
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев', default=0, editable=False
+    )
+    thumbnails_ready = models.BooleanField(
+        verbose_name='Миниатюры готовы',
+        default=True,
+        editable=False,
+        help_text='Пост с новой картинкой попадает в ленты, когда фоновый '
+                  'пул создаст её миниатюры'
     )
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты сортируются по (-pub_date, -pk): pk входит в индексы,
+        # чтобы SQLite не досортировывал его во временном B-дереве.
+        # Общая лента выводит только посты с готовыми миниатюрами
+        indexes = [
+            models.Index(
+                fields=['thumbnails_ready', '-pub_date', '-id'],
+                name='post_ready_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        # Группа и картинка на момент загрузки: по ним сигналы узнают
+        # о переносе поста и о замене картинки
+        instance.loaded_group_id = loaded.get('group_id')
+        instance.loaded_image = loaded.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # comment_count меняют только сигналы Comment через F(): правка
+        # поста не должна затирать его значением, прочитанным раньше
+        # thumbnails_ready выставляет фоновый пул: правка текста его не
+        # трогает, сбрасывает его только замена картинки
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = {'comment_count'}
+            if self.image.name == getattr(self, 'loaded_image', None):
+                skipped.add('thumbnails_ready')
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
@@ -75,6 +147,13 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -95,6 +174,93 @@ class Follow(models.Model):
 
     class Meta:
         ordering = ['-author']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self'
+            ),
+        ]
 
     def __str__(self):
         return self.user.username
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов', default=0
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок', default=0
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class ImageBlob(models.Model):
+    name = models.CharField(
+        verbose_name='Файл', max_length=255, primary_key=True
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Ссылок', default=0
+    )
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,220 @@
+import base64
+import binascii
+import json
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+
+from .models import Follow
+
+POST_COUNT_KEY = 'post_count:{}'
+
+
+def post_count_key(scope):
+    return POST_COUNT_KEY.format(scope)
+
+
+def post_count_scopes(post):
+    """Области подсчёта, в которые входит пост."""
+    scopes = ['all', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def adjust_post_counts(scopes, delta):
+    """Сдвигает закэшированные счётчики; отсутствующие не создаются."""
+    for scope in scopes:
+        try:
+            cache.incr(post_count_key(scope), delta)
+        except ValueError:
+            pass
+
+
+def invalidate_follow_counts(author_id=None, user_id=None):
+    """Сбрасывает счётчики лент подписок читателей автора."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    cache.delete_many(
+        [post_count_key(f'follow:{user_id}') for user_id in user_ids]
+    )
+
+
+def estimate_count(queryset):
+    """Быстрая оценка числа строк таблицы без полного COUNT(*)."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    bounds = queryset.model._default_manager.aggregate(
+        low=Min('pk'), high=Max('pk')
+    )
+    if bounds['high'] is None:
+        return 0
+    return bounds['high'] - bounds['low'] + 1
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который хранит число объектов в кэше по области.
+
+    Область (count_scope) — 'all', 'group:<id>', 'author:<id>' или
+    'follow:<user_id>'; сигналы Post и Follow сдвигают или сбрасывают
+    значения. Для 'all' при оценке выше POSTS_COUNT_ESTIMATE_THRESHOLD
+    вместо точного COUNT(*) используется estimate_count().
+    """
+
+    def __init__(self, object_list, per_page, count_scope=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_scope = count_scope
+
+    @cached_property
+    def count(self):
+        if self.count_scope is None:
+            return super().count
+        key = post_count_key(self.count_scope)
+        value = cache.get(key)
+        if value is None:
+            value = self.fresh_count()
+            cache.add(key, value, settings.POSTS_COUNT_CACHE_TIMEOUT)
+        return value
+
+    def fresh_count(self):
+        threshold = settings.POSTS_COUNT_ESTIMATE_THRESHOLD
+        if self.count_scope == 'all' and threshold is not None:
+            estimate = estimate_count(self.object_list)
+            if estimate > threshold:
+                return estimate
+        return super().count
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Пагинатор по ключу (keyset) с совместимым режимом ?page=N.
+
+    В режиме курсора страница выбирается условием по полям сортировки
+    вместо OFFSET и без COUNT(*), поэтому глубокие страницы стоят
+    столько же, сколько первая. Обычный get_page() остаётся
+    для старых ссылок вида ?page=N.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'), **kwargs):
+        if hasattr(object_list, 'order_by'):
+            object_list = object_list.order_by(*ordering)
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.cursor_mode = False
+
+    @property
+    def field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def position_of(self, obj):
+        """Значения полей сортировки объекта — его позиция в ленте."""
+        return tuple(attrgetter(name)(obj) for name in self.field_names)
+
+    def encode_cursor(self, position, backwards=False):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position
+        ]
+        payload = json.dumps([values, int(backwards)]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (позиция, направление) или (None, False),
+        если курсор пустой или испорчен."""
+        if not cursor:
+            return None, False
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values, backwards = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.ordering):
+                return None, False
+            return self.to_position(values), bool(backwards)
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            return None, False
+
+    def to_position(self, values):
+        opts = self.object_list.model._meta
+        position = []
+        for name, value in zip(self.field_names, values):
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            position.append(field.to_python(value))
+        return tuple(position)
+
+    def keyset_filter(self, position, backwards):
+        """Лексикографическое условие «строго после позиции»."""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            name = field.lstrip('-')
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_name, prev_value in zip(self.field_names[:index],
+                                             position[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def fetch(self, position, backwards, limit):
+        """До limit объектов после позиции в нужном направлении."""
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        queryset = self.object_list.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(position, backwards)
+            )
+        return list(queryset[:limit])
+
+    def get_cursor_page(self, cursor=None):
+        position, backwards = self.decode_cursor(cursor)
+        rows = self.fetch(position, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        self.cursor_mode = True
+        page = self._get_page(rows, 1, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                page.next_cursor = self.encode_cursor(
+                    self.position_of(rows[-1])
+                )
+            if position is not None and (has_more or not backwards):
+                page.previous_cursor = self.encode_cursor(
+                    self.position_of(rows[0]), backwards=True
+                )
+        return page
+
+
+def paginate(request, object_list, paginator_class=CursorPaginator,
+             **kwargs):
+    """Страница для ленты: ?page=N по-старому, иначе по курсору."""
+    paginator = paginator_class(
+        object_list, settings.NUMBER_OF_POSTS, **kwargs
+    )
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
@@ -0,0 +1,194 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Таблицы posts_post_fts и posts_comment_fts — внешние индексы (external
+content) над posts_post и posts_comment: сами тексты не дублируются, а
+триггеры на вставку, изменение и удаление держат индекс в актуальном
+состоянии при любой записи, включая bulk_create и raw SQL.
+
+Индекс создаёт install() после каждого migrate. SQLite перестраивает
+таблицу при изменении схемы и при этом теряет её триггеры, поэтому
+install() создаёт недостающие и пересобирает индекс, если их не было.
+
+На других СУБД поиск откатывается к icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Comment, Post
+
+WORD_RE = re.compile(r'\w+')
+MAX_WORDS = 10
+INDEXES = {
+    Post: 'posts_post_fts',
+    Comment: 'posts_comment_fts',
+}
+CREATE_INDEX_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5('
+    "text, content='{table}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS_SQL = {
+    '{index}_ai': (
+        'CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} '
+        'BEGIN '
+        'INSERT INTO {index} (rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+    '{index}_ad': (
+        'CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} '
+        'BEGIN '
+        "INSERT INTO {index} ({index}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    '{index}_au': (
+        'CREATE TRIGGER IF NOT EXISTS {index}_au '
+        'AFTER UPDATE OF text ON {table} '
+        'BEGIN '
+        "INSERT INTO {index} ({index}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO {index} (rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+# Пост находится и по своему тексту, и по комментариям к нему; совпадение
+# в комментарии весит меньше (bm25 отрицателен: чем меньше, тем лучше)
+MATCHES_SQL = (
+    'SELECT post_id, MIN(rank) AS rank FROM ('
+    'SELECT rowid AS post_id, bm25(posts_post_fts) AS rank '
+    'FROM posts_post_fts WHERE posts_post_fts MATCH %s '
+    'UNION ALL '
+    'SELECT c.post_id, bm25(posts_comment_fts) * %s '
+    'FROM posts_comment_fts '
+    'JOIN posts_comment c ON c.id = posts_comment_fts.rowid '
+    'WHERE posts_comment_fts MATCH %s'
+    ') GROUP BY post_id'
+)
+
+
+def is_supported(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def install(using='default', rebuild=False):
+    """Создаёт индексы и триггеры; пересобирает, если чего-то не было."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for model, index in INDEXES.items():
+            cursor.execute(
+                'SELECT name FROM sqlite_master WHERE name LIKE %s',
+                [f'{index}%'],
+            )
+            existing = {name for name, in cursor.fetchall()}
+            names = {name.format(index=index) for name in TRIGGERS_SQL}
+            missing = not {index, *names} <= existing
+            table = model._meta.db_table
+            cursor.execute(CREATE_INDEX_SQL.format(index=index, table=table))
+            for sql in TRIGGERS_SQL.values():
+                cursor.execute(sql.format(index=index, table=table))
+            if missing or rebuild:
+                cursor.execute(
+                    f"INSERT INTO {index} ({index}) VALUES ('rebuild')"
+                )
+
+
+def drop_triggers(using='default'):
+    """Отключает обновление индекса, например на время массовой загрузки.
+
+    Индекс пересобирается следующим вызовом install().
+    """
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for index in INDEXES.values():
+            for name in TRIGGERS_SQL:
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {name.format(index=index)}'
+                )
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое как префикс.
+
+    Слова берутся в кавычки, поэтому операторы и спецсимволы FTS5
+    во вводе не могут сломать запрос.
+    """
+    words = WORD_RE.findall(query)[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching(queryset, query):
+    """queryset, ограниченный совпадениями с индексом его модели."""
+    index = INDEXES[queryset.model]
+    table = queryset.model._meta.db_table
+    # pk__in=RawSQL(...) дал бы IN ((SELECT ...)): скаляр, а не список
+    return queryset.extra(
+        where=[f'{table}.id IN (SELECT rowid FROM {index} '
+               f'WHERE {index} MATCH %s)'],
+        params=[match_expression(query)],
+    )
+
+
+class SearchResults:
+    """Посты, найденные по запросу, в порядке релевантности.
+
+    Поддерживает count() и срезы, поэтому годится для Paginator:
+    каждая страница — один запрос за id с LIMIT/OFFSET и один за постами.
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+        self.using = router.db_for_read(Post)
+
+    def params(self):
+        return [
+            self.expression, settings.SEARCH_COMMENT_WEIGHT, self.expression
+        ]
+
+    def execute(self, sql, params):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if not self.expression:
+            return 0
+        return self.execute(
+            f'SELECT COUNT(*) FROM ({MATCHES_SQL})', self.params()
+        )[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        if not self.expression:
+            return []
+        start = item.start or 0
+        rows = self.execute(
+            f'{MATCHES_SQL} ORDER BY rank, post_id DESC LIMIT %s OFFSET %s',
+            self.params() + [item.stop - start, start],
+        )
+        ids = [post_id for post_id, _ in rows]
+        posts = Post.objects.using(self.using).filter(
+            thumbnails_ready=True
+        ).select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def search_posts(query):
+    """Посты по запросу: ранжированные FTS5 или icontains вне SQLite."""
+    if is_supported(router.db_for_read(Post)):
+        return SearchResults(query)
+    query = query.strip()
+    if not query:
+        return Post.objects.none()
+    return Post.objects.select_related('author', 'group').filter(
+        Q(text__icontains=query) | Q(comments__text__icontains=query),
+        thumbnails_ready=True,
+    ).distinct().order_by('-pub_date', '-pk')
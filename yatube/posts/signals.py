@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from . import blobs, comments, feeds, search, stats, timeline
+from .caching import bump_generation, page_scopes
+from .image_metadata import apply_metadata
+from .models import Comment, Follow, Group, Post
+from .paginators import (
+    adjust_post_counts, invalidate_follow_counts, post_count_scopes
+)
+
+User = get_user_model()
+# Поля пользователя, которые выводятся на страницах
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if not raw:
+        apply_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded_group_id = getattr(instance, 'loaded_group_id', instance.group_id)
+    bump_generation('posts', f'post:{instance.pk}', *page_scopes(
+        [instance.author_id], {loaded_group_id, instance.group_id}
+    ))
+    if created:
+        timeline.fan_out_post(instance)
+        feeds.invalidate_author_posts(instance.author_id)
+        stats.adjust(instance.author_id, posts_count=1)
+        adjust_post_counts(post_count_scopes(instance), 1)
+        invalidate_follow_counts(author_id=instance.author_id)
+        blobs.add_reference(instance.image.name)
+    elif loaded_group_id != instance.group_id:
+        if loaded_group_id:
+            adjust_post_counts([f'group:{loaded_group_id}'], -1)
+        if instance.group_id:
+            adjust_post_counts([f'group:{instance.group_id}'], 1)
+    loaded_image = getattr(instance, 'loaded_image', instance.image.name)
+    if not created and loaded_image != instance.image.name:
+        blobs.add_reference(instance.image.name)
+        blobs.release(loaded_image)
+        # Пост с новой картинкой пропадает из лент подписок до её миниатюр
+        feeds.invalidate_author_posts(instance.author_id)
+    instance.loaded_group_id = instance.group_id
+    instance.loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_generation('posts', f'post:{instance.pk}', *page_scopes(
+        [instance.author_id], [instance.group_id]
+    ))
+    feeds.invalidate_author_posts(instance.author_id)
+    stats.adjust(instance.author_id, posts_count=-1)
+    adjust_post_counts(post_count_scopes(instance), -1)
+    invalidate_follow_counts(author_id=instance.author_id)
+    blobs.release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_generation(f'post:{instance.post_id}')
+    if created:
+        stats.adjust(instance.author_id, comments_count=1)
+        comments.adjust(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_generation(f'post:{instance.post_id}')
+    stats.adjust(instance.author_id, comments_count=-1)
+    comments.adjust(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill_follow(instance.user_id, instance.author_id)
+        bump_generation(*page_scopes([instance.user_id, instance.author_id]))
+        invalidate_follow_counts(user_id=instance.user_id)
+        stats.adjust(instance.author_id, followers_count=1)
+        stats.adjust(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.trim_follow(instance.user_id, instance.author_id)
+    bump_generation(*page_scopes([instance.user_id, instance.author_id]))
+    invalidate_follow_counts(user_id=instance.user_id)
+    stats.adjust(instance.author_id, followers_count=-1)
+    stats.adjust(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation('posts', f'group:{instance.slug}')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Вход в систему обновляет только last_login — имя на страницах то же
+    if raw or instance._state.adding or update_fields == frozenset(
+        ['last_login']
+    ):
+        return
+    instance.loaded_names = User.objects.filter(pk=instance.pk).values_list(
+        *NAME_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.create_empty(instance.pk)
+        # Профиль мог быть отдан как 404 с ETag до регистрации
+        bump_generation(f'author:{instance.username}')
+        return
+    loaded = getattr(instance, 'loaded_names', None)
+    names = tuple(getattr(instance, field) for field in NAME_FIELDS)
+    instance.loaded_names = names
+    if loaded is None or loaded == names:
+        return
+    # Имя автора есть на карточках его постов: в общей ленте, на страницах
+    # групп и в профиле, адрес которого меняется вместе с username
+    group_ids = instance.posts.exclude(group=None).values_list(
+        'group_id', flat=True
+    ).distinct()
+    bump_generation(
+        'posts', f'author:{loaded[0]}', f'author:{instance.username}',
+        *page_scopes(group_ids=group_ids)
+    )
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install(using)
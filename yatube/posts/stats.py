@@ -0,0 +1,123 @@
+"""Денормализованные счётчики автора.
+
+Счётчики меняются сигналами на Post, Comment и Follow через F()-выражения,
+поэтому профиль и страница поста читают одну строку вместо COUNT(*).
+Расхождения исправляет команда reconcile_author_stats.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.routers import use_replicas
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def count_for(user_id):
+    """Точные значения счётчиков, посчитанные по исходным таблицам."""
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'comments_count': Comment.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def create_for(user_id):
+    # Строку могла не застать реплика: пересчёт и повторное чтение после
+    # гонки идут в default, где строка уже есть
+    with use_replicas(False):
+        try:
+            with transaction.atomic():
+                return AuthorStats.objects.create(
+                    user_id=user_id, **count_for(user_id)
+                )
+        except IntegrityError:
+            return AuthorStats.objects.get(user_id=user_id)
+
+
+def create_empty(user_id):
+    """Нулевые счётчики нового пользователя: профилю не нужен пересчёт."""
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id)], ignore_conflicts=True
+    )
+
+
+def adjust(user_id, **deltas):
+    """Атомарно прибавляет deltas к счётчикам пользователя.
+
+    Если строки ещё нет, она создаётся по точному пересчёту, который
+    уже учитывает изменение. При уменьшении строка не создаётся:
+    пользователь может удаляться каскадом.
+    """
+    rows = AuthorStats.objects.filter(user_id=user_id, **{
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    })
+    updated = rows.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        create_for(user_id)
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return create_for(user.pk)
+
+
+def reconcile(user_ids):
+    """Сверяет счётчики с исходными таблицами, возвращает число правок."""
+    repaired = 0
+    for user_id in user_ids:
+        actual = count_for(user_id)
+        stats, created = AuthorStats.objects.get_or_create(
+            user_id=user_id, defaults=actual
+        )
+        if created:
+            repaired += 1
+            continue
+        if any(getattr(stats, field) != value
+               for field, value in actual.items()):
+            AuthorStats.objects.filter(user_id=user_id).update(**actual)
+            repaired += 1
+    return repaired
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild():
+    """Пересчитывает счётчики всех пользователей одним INSERT ... SELECT.
+
+    Для массовой загрузки: reconcile() делает несколько запросов
+    на каждого пользователя.
+    """
+    AuthorStats.objects.all().delete()
+    # Аннотации идут в SELECT в порядке объявления, после pk
+    rows = User.objects.order_by().annotate(
+        posts_total=_count(Post, 'author'),
+        comments_total=_count(Comment, 'author'),
+        followers_total=_count(Follow, 'author'),
+        following_total=_count(Follow, 'user'),
+    ).values_list(
+        'pk', 'posts_total', 'comments_total', 'followers_total',
+        'following_total',
+    )
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {AuthorStats._meta.db_table} (user_id, '
+            'posts_count, comments_count, followers_count, following_count) '
+            f'{sql}',
+            params,
+        )
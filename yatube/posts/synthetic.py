@@ -0,0 +1,272 @@
+"""Синтетический набор данных для нагрузочных замеров.
+
+Набор воспроизводим: при одном seed получаются одни и те же строки,
+только даты отсчитываются от момента запуска.
+Объекты пишутся пачками через bulk_create с заранее известными pk,
+поэтому в памяти держится только текущая пачка и миллионы строк
+генерируются на ноутбуке.
+
+Распределения похожи на настоящие:
+
+* популярность авторов убывает по степенному закону (закон Ципфа):
+  на первых авторов подписана заметная часть пользователей. Посты
+  распределены по авторам равномерно, иначе ленты подписок (по записи
+  на каждую пару подписчик — пост автора) росли бы квадратично;
+* число подписок и комментариев у поста — распределение Парето с
+  заданным средним: у большинства почти ничего, у немногих очень много.
+
+Тексты берутся из заранее сгенерированного Faker набора фраз: вызывать
+Faker на каждую строку слишком медленно. Счётчики, ленты и поисковый
+индекс пересобираются в конце, как после import_ndjson.
+"""
+import random
+from bisect import bisect
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from . import blobs, search
+from .image_metadata import read_metadata
+from .models import Comment, Follow, Group, Post
+from .transfer import insert_as_is, rebuild_derived
+
+User = get_user_model()
+
+SENTENCE_POOL = 5000
+NAME_POOL = 1000
+IMAGE_SIZE = (760, 439)
+PASSWORD = 'password'
+
+
+def next_pk(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class ZipfSampler:
+    """Выбор номеров 0..n-1 с вероятностью, пропорциональной 1/(i+1)^s."""
+
+    def __init__(self, rng, n, exponent):
+        self.rng = rng
+        self.cumulative = list(accumulate(
+            1 / (i + 1) ** exponent for i in range(n)
+        ))
+
+    def __call__(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return min(bisect(self.cumulative, point), len(self.cumulative) - 1)
+
+
+class DatasetGenerator:
+    def __init__(self, users, posts, groups=100, follows=20, comments=3,
+                 images=0, image_ratio=0.2, days=365, zipf=1.1, seed=0,
+                 batch_size=5000, locale='ru_RU', timelines=True):
+        self.users = users
+        self.timelines = timelines
+        self.posts = posts
+        self.groups = groups
+        self.follows = follows
+        self.comments = comments
+        self.images = images
+        self.image_ratio = image_ratio
+        self.days = days
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        faker = Faker(locale)
+        faker.seed_instance(seed)
+        self.sentences = [
+            faker.paragraph(nb_sentences=3) for _ in range(SENTENCE_POOL)
+        ]
+        self.short = [faker.sentence() for _ in range(SENTENCE_POOL)]
+        self.first_names = [faker.first_name() for _ in range(NAME_POOL)]
+        self.last_names = [faker.last_name() for _ in range(NAME_POOL)]
+        # Популярные авторы — первые по номеру
+        self.popular = ZipfSampler(self.rng, users, zipf)
+        self.now = timezone.now().replace(microsecond=0)
+        self.counts = {
+            'user': 0, 'group': 0, 'post': 0, 'comment': 0, 'follow': 0,
+        }
+
+    def pareto(self, mean, alpha=1.5):
+        """Целое с распределением Парето и средним mean.
+
+        Дробная часть округляется вверх с вероятностью, равной ей самой:
+        int() отбрасывал бы её и занижал среднее почти на 0.5.
+        """
+        if mean <= 0:
+            return 0
+        value = (self.rng.paretovariate(alpha) - 1) * mean * (alpha - 1)
+        whole = int(value)
+        return whole + (self.rng.random() < value - whole)
+
+    def generate(self):
+        with transaction.atomic():
+            search.drop_triggers()
+            self.first_user = next_pk(User)
+            self.first_group = next_pk(Group)
+            self.first_post = next_pk(Post)
+            self.first_comment = next_pk(Comment)
+            self.create_users()
+            self.create_groups()
+            self.create_follows()
+            images = self.create_images()
+            self.create_posts(images)
+            rebuild_derived(timelines=self.timelines)
+        return self.counts
+
+    def insert(self, name, model, objects, **kwargs):
+        model.objects.bulk_create(objects, **kwargs)
+        self.counts[name] += len(objects)
+
+    def insert_dated(self, name, model, objects):
+        insert_as_is(model, objects)
+        self.counts[name] += len(objects)
+
+    def batches(self, total, build):
+        batch = []
+        for number in range(total):
+            batch.append(build(number))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def user_pk(self, number):
+        return self.first_user + number
+
+    def create_users(self):
+        password = make_password(PASSWORD)
+
+        def build(number):
+            pk = self.user_pk(number)
+            return User(
+                pk=pk,
+                username=f'user{pk}',
+                first_name=self.rng.choice(self.first_names),
+                last_name=self.rng.choice(self.last_names),
+                email=f'user{pk}@example.com',
+                password=password,
+                date_joined=self.now - timedelta(days=self.days),
+            )
+
+        for batch in self.batches(self.users, build):
+            self.insert('user', User, batch)
+
+    def create_groups(self):
+        def build(number):
+            pk = self.first_group + number
+            return Group(
+                pk=pk,
+                title=self.rng.choice(self.short)[:200],
+                slug=f'group-{pk}',
+                description=self.rng.choice(self.sentences),
+            )
+
+        for batch in self.batches(self.groups, build):
+            self.insert('group', Group, batch)
+
+    def create_follows(self):
+        batch = []
+        for number in range(self.users):
+            user_id = self.user_pk(number)
+            wanted = min(self.pareto(self.follows), self.users - 1)
+            authors = set()
+            # Популярных авторов мало, и выбор по Ципфу быстро начинает
+            # повторяться: недостающих авторов добирает равномерный выбор
+            for _ in range(wanted * 2):
+                if len(authors) >= wanted:
+                    break
+                author_id = self.user_pk(self.popular())
+                if author_id != user_id:
+                    authors.add(author_id)
+            while len(authors) < wanted:
+                author_id = self.user_pk(self.rng.randrange(self.users))
+                if author_id != user_id:
+                    authors.add(author_id)
+            batch.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in sorted(authors)
+            )
+            if len(batch) >= self.batch_size:
+                self.insert('follow', Follow, batch)
+                batch = []
+        if batch:
+            self.insert('follow', Follow, batch)
+
+    def create_images(self):
+        """Картинки в хранилище и их метаданные для полей Post."""
+        storage = blobs.storage()
+        images = []
+        for _ in range(self.images):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            for _ in range(20):
+                x, y = (self.rng.randrange(size) for size in IMAGE_SIZE)
+                image.paste(
+                    tuple(self.rng.randrange(256) for _ in range(3)),
+                    (x, y, x + 40, y + 40),
+                )
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            name = storage.save('posts/synthetic.jpg', ContentFile(
+                buffer.getvalue()
+            ))
+            images.append((name, read_metadata(Post(image=name).image)))
+        return images
+
+    def random_date(self):
+        return self.now - timedelta(
+            seconds=self.rng.randrange(self.days * 24 * 60 * 60)
+        )
+
+    def create_posts(self, images):
+        comment_pk = self.first_comment
+        posts = []
+        comments = []
+        for number in range(self.posts):
+            post = Post(
+                pk=self.first_post + number,
+                author_id=self.user_pk(self.rng.randrange(self.users)),
+                text=self.rng.choice(self.sentences),
+                pub_date=self.random_date(),
+            )
+            if self.groups and self.rng.random() < 0.5:
+                post.group_id = self.first_group + self.rng.randrange(
+                    self.groups
+                )
+            if images and self.rng.random() < self.image_ratio:
+                post.image, metadata = self.rng.choice(images)
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+            posts.append(post)
+            for _ in range(self.pareto(self.comments)):
+                comments.append(Comment(
+                    pk=comment_pk,
+                    post_id=post.pk,
+                    author_id=self.user_pk(self.rng.randrange(self.users)),
+                    text=self.rng.choice(self.short),
+                    created=min(self.now, post.pub_date + timedelta(
+                        seconds=self.rng.randrange(7 * 24 * 60 * 60)
+                    )),
+                ))
+                comment_pk += 1
+            if len(posts) >= self.batch_size:
+                self.flush_posts(posts, comments)
+                posts, comments = [], []
+        self.flush_posts(posts, comments)
+
+    def flush_posts(self, posts, comments):
+        self.insert_dated('post', Post, posts)
+        for start in range(0, len(comments), self.batch_size):
+            self.insert_dated(
+                'comment', Comment, comments[start:start + self.batch_size]
+            )
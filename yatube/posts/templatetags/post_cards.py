@@ -0,0 +1,79 @@
+from hashlib import md5
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..thumbnails import image_box, resolve_srcsets, resolve_thumbnails
+
+register = template.Library()
+
+POST_CARD_KEY = 'post_card:{}:{}:{}'
+
+
+def card_version(post):
+    """Версия карточки по всем данным, которые в неё попадают.
+
+    Правка поста, имени автора или группы меняет версию, а значит
+    и ключ кэша, поэтому устаревшая карточка больше не читается.
+    """
+    author = post.author
+    group = post.group
+    parts = [
+        post.text, str(post.image), post.image_placeholder,
+        str(post.image_width), str(post.image_height),
+        post.pub_date.isoformat(),
+        author.username, author.first_name, author.last_name,
+        group.slug if group else '',
+    ]
+    return md5('\x00'.join(parts).encode()).hexdigest()
+
+
+def post_card_key(post, variant):
+    return POST_CARD_KEY.format(variant, post.pk, card_version(post))
+
+
+@register.simple_tag
+def post_cards(posts, variant='feed'):
+    """HTML карточек постов: одним get_many из кэша, промахи рендерятся.
+
+    Миниатюры и srcset для всех промахов находятся одним пакетом.
+    Карточка, варианты картинки которой ещё не созданы, не кэшируется,
+    чтобы srcset появился, как только их допишет фоновый пул.
+    """
+    posts = list(posts)
+    keys = [post_card_key(post, variant) for post in posts]
+    cached = cache.get_many(keys)
+    uncached = [post for post, key in zip(posts, keys) if key not in cached]
+    thumbnails = resolve_thumbnails(uncached)
+    srcsets = resolve_srcsets(uncached)
+    missing = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(
+                'posts/includes/post_card.html',
+                {
+                    'post': post,
+                    'variant': variant,
+                    'thumbnail': thumbnails.get(post.pk),
+                    'box': image_box(post),
+                    'srcset': srcsets.get(post.pk),
+                    'sizes': settings.POST_IMAGE_SIZES,
+                },
+            )
+            if not post.image or post.pk in srcsets:
+                missing[key] = html
+        cards.append(mark_safe(html))
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
+
+
+@register.simple_tag(name='image_box')
+def image_box_tag(post, size='card'):
+    """Размер блока картинки: {% image_box post 'detail' as box %}."""
+    return image_box(post, size)
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha256
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from .. import blobs
+from ..models import ImageBlob, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, content_type='image/gif'),
+        )
+
+    def test_upload_stored_under_sharded_hash(self):
+        """Файл сохраняется под путём из хэша содержимого."""
+        digest = sha256(SMALL_GIF).hexdigest()
+        post = self.create_post('Картинка.GIF')
+        self.assertEqual(
+            post.image.name,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif',
+        )
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом со счётчиком ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)],
+        )
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).references, 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется только вместе с последним постом."""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replaced_image_releases_old_file(self):
+        """Замена картинки снимает ссылку со старого файла."""
+        post = Post.objects.get(pk=self.create_post().pk)
+        old_path = post.image.path
+        post.image = SimpleUploadedFile(
+            'other.gif', SMALL_GIF + b'\x00', content_type='image/gif'
+        )
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', 'references')),
+            [(post.image.name, 1)],
+        )
+
+    def test_delete_file_rechecks_references_under_lock(self):
+        """Файл удаляется под блокировкой строки и только без ссылок."""
+        name = self.create_post().image.name
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        blobs.delete_file(name)
+        self.assertTrue(os.path.exists(path))
+        ImageBlob.objects.update(references=0)
+        locked = []
+
+        def delete(image_file):
+            locked.extend(ImageBlob.objects.filter(name=name).values_list(
+                'references', flat=True
+            ))
+            os.remove(path)
+
+        with mock.patch.object(blobs, 'delete_thumbnails', delete):
+            blobs.delete_file(name)
+        self.assertEqual(locked, [0])
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_image_blobs исправляет счётчики ссылок."""
+        post = self.create_post()
+        ImageBlob.objects.all().delete()
+        call_command('recount_image_blobs', stdout=StringIO())
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).references, 1
+        )
+        ImageBlob.objects.update(references=5)
+        call_command('recount_image_blobs', stdout=StringIO())
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).references, 1
+        )
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.comments = [
+            Comment.objects.create(
+                author=cls.user, post=cls.post, text=f'Комментарий #{i}'
+            )
+            for i in range(5)
+        ]
+
+    def count(self):
+        return Post.objects.get(pk=self.post.pk).comment_count
+
+    def test_comment_count_follows_writes(self):
+        """Счётчик комментариев меняется при создании и удалении."""
+        self.assertEqual(self.count(), 5)
+        Comment.objects.filter(pk=self.comments[0].pk).get().delete()
+        self.assertEqual(self.count(), 4)
+
+    def test_post_save_keeps_comment_count(self):
+        """Сохранение поста не затирает счётчик старым значением."""
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(author=self.user, post=post, text='Новый')
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.count(), 6)
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста первая страница комментариев и ссылка дальше."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:2])
+        self.assertContains(response, 'Комментарии: 5')
+        self.assertContains(response, f'?cursor={comments.next_cursor}')
+
+    def test_chunks_as_html_and_json(self):
+        """Следующие страницы отдаются HTML-фрагментом или JSON."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Комментарий #1')
+        self.assertNotContains(response, '<html')
+        cursor = response.context['comments'].next_cursor
+        response = self.client.get(
+            url, {'cursor': cursor}, HTTP_ACCEPT='application/json'
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий #2', 'Комментарий #3'],
+        )
+        response = self.client.get(
+            url, {'cursor': data['next_cursor']},
+            HTTP_ACCEPT='application/json',
+        )
+        data = response.json()
+        self.assertEqual(len(data['comments']), 1)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_comment_authors_loaded_together(self):
+        """Авторы комментариев загружаются вместе с комментариями."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        with self.assertNumQueries(2):
+            self.client.get(url, HTTP_ACCEPT='application/json')
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_comments исправляет расхождения."""
+        Post.objects.filter(pk=self.post.pk).update(comment_count=42)
+        call_command('recount_comments', stdout=StringIO())
+        self.assertEqual(self.count(), 5)
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+        self.pages = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 по ETag."""
+        for page in self.pages:
+            with self.subTest(page=page):
+                etag = self.authorized_client.get(page)['ETag']
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_validators(self):
+        """Новый пост или комментарий меняет ETag страниц."""
+        etags = [self.authorized_client.get(page)['ETag']
+                 for page in self.pages]
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий'
+        )
+        for page, etag in zip(self.pages, etags):
+            with self.subTest(page=page):
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """ETag гостя не подходит вошедшему пользователю."""
+        etag = self.guest_client.get(self.pages[0])['ETag']
+        response = self.authorized_client.get(
+            self.pages[0], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_csrf_cookie(self):
+        """Страница с формой не отдаёт 304 после смены CSRF-cookie."""
+        page = self.pages[-1]
+        response = self.authorized_client.get(page)
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        etag = response['ETag']
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.authorized_client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_guest_gets_last_modified(self):
+        """Гость получает Last-Modified после изменения ленты."""
+        response = self.guest_client.get(self.pages[0])
+        self.assertNotIn('Last-Modified', response)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(self.pages[0])
+        last_modified = response['Last-Modified']
+        response = self.guest_client.get(
+            self.pages[0], HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..feeds import get_author_posts
+from ..models import Follow, Post
+
+User = get_user_model()
+FEED_ENGINES = ('timeline', 'merge', 'sql')
+POSTS_PER_AUTHOR = 8
+
+
+class FollowFeedEnginesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'writer{i}') for i in range(3)
+        ]
+        stranger = User.objects.create_user(username='stranger')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for i in range(POSTS_PER_AUTHOR):
+            for author in cls.authors + [stranger]:
+                Post.objects.create(author=author, text=f'Пост {i}')
+        cls.expected = list(
+            Post.objects.filter(author__in=cls.authors).order_by(
+                '-pub_date', '-pk').values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def read_feed(self):
+        seen = []
+        url = reverse('posts:follow_index')
+        page = self.client.get(url).context['page_obj']
+        while True:
+            seen.extend(post.pk for post in page)
+            if page.next_cursor is None:
+                return seen
+            page = self.client.get(
+                f'{url}?cursor={page.next_cursor}'
+            ).context['page_obj']
+
+    def test_engines_return_same_feed(self):
+        """Все движки отдают одну и ту же ленту подписок."""
+        for engine in FEED_ENGINES:
+            with self.subTest(engine=engine):
+                with override_settings(FOLLOW_FEED_ENGINE=engine):
+                    self.assertEqual(self.read_feed(), self.expected)
+
+    def test_engines_support_page_links(self):
+        """Все движки поддерживают ссылки ?page=N."""
+        url = reverse('posts:follow_index') + '?page=2'
+        for engine in FEED_ENGINES:
+            with self.subTest(engine=engine):
+                with override_settings(FOLLOW_FEED_ENGINE=engine):
+                    page = self.client.get(url).context['page_obj']
+                    self.assertEqual(
+                        [post.pk for post in page], self.expected[10:20]
+                    )
+
+    @override_settings(FOLLOW_FEED_ENGINE='merge')
+    def test_merge_engine_sees_new_post(self):
+        """Новый пост сбрасывает закэшированный список автора."""
+        self.read_feed()
+        new_post = Post.objects.create(author=self.authors[0], text='Новый')
+        self.assertEqual(self.read_feed()[0], new_post.pk)
+
+    @override_settings(AUTHOR_POSTS_CACHE_SIZE=5)
+    def test_author_lists_fetched_in_one_query(self):
+        """Списки всех авторов без кэша читаются одним запросом."""
+        author_ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            lists = get_author_posts(author_ids)
+        self.assertEqual(sorted(len(posts) for posts in lists), [5, 5, 5])
+        self.assertEqual(
+            [pk for _, pk in sorted(
+                (entry for posts in lists for entry in posts), reverse=True
+            )][:10],
+            self.expected[:10],
+        )
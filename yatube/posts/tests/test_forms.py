@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from hashlib import sha256
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -69,6 +70,7 @@ class PostFormsTests(TestCase):
         response = self.authorized_client.post(reverse('posts:post_create'),
                                                data=form_data,
                                                follow=True)
+        digest = sha256(self.small_gif).hexdigest()
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(Post.objects.count(),
                          posts_count + 1,
@@ -77,7 +79,7 @@ class PostFormsTests(TestCase):
                         text='Тестовый пост в форме',
                         group=self.group.id,
                         author=self.user,
-                        image='posts/small2.gif'
+                        image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
                         ).exists(), 'Ошибка при создании поста')
 
     def test_edit_post(self):
@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post
+from ..thumbnails import image_box
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def metadata(self, post):
+        return Post.objects.filter(pk=post.pk).values(
+            'image_width', 'image_height', 'image_size', 'image_placeholder'
+        ).get()
+
+    def test_upload_stores_metadata(self):
+        """При загрузке сохраняются размеры, вес и цвет заглушки."""
+        self.assertEqual(self.metadata(self.post), {
+            'image_width': 2,
+            'image_height': 1,
+            'image_size': len(SMALL_GIF),
+            'image_placeholder': '#808080',
+        })
+
+    def test_post_without_image_has_no_metadata(self):
+        """У поста без картинки метаданные пустые."""
+        post = Post.objects.create(author=self.user, text='Без картинки')
+        self.assertEqual(self.metadata(post), {
+            'image_width': None,
+            'image_height': None,
+            'image_size': None,
+            'image_placeholder': '',
+        })
+
+    def test_backfill_fills_missing_rows(self):
+        """Команда backfill_image_metadata заполняет старые записи."""
+        expected = self.metadata(self.post)
+        Post.objects.update(
+            image_width=None, image_height=None, image_size=None,
+            image_placeholder='',
+        )
+        call_command('backfill_image_metadata', stdout=StringIO())
+        self.assertEqual(self.metadata(self.post), expected)
+
+    def test_detail_page_reserves_image_box(self):
+        """Страница поста выводит размеры и цвет заглушки картинки."""
+        response = self.client.get(f'/posts/{self.post.pk}/')
+        self.assertContains(response, 'width="960" height="639"')
+        self.assertContains(response, 'background-color: #808080')
+
+    def test_feed_card_reserves_image_box(self):
+        """Карточка в ленте выводит размер блока по полям поста."""
+        cache.clear()
+        response = self.client.get('/')
+        self.assertContains(response, 'width="760" height="439"')
+
+    def test_image_box_follows_stored_size(self):
+        """Блок картинки считается по сохранённым размерам, без файла."""
+        post = Post(
+            image='posts/missing.jpg', image_width=3000, image_height=1000
+        )
+        self.assertEqual(image_box(post), {'width': 760, 'height': 439})
+        with self.settings(POST_THUMBNAIL_SIZES={'card': ('760x439', {})}):
+            self.assertEqual(image_box(post), {'width': 760, 'height': 253})
+        post.image_width = None
+        self.assertIsNone(image_box(post))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post
+from ..thumbnails import generate_thumbnails
+
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class MediaGarbageCollectorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        generate_thumbnails(self.post.image.name)
+        self.orphan_image = self.write('posts/aa/bb/orphan.gif')
+        self.orphan_thumbnail = self.write('cache/aa/bb/orphan.jpg')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def write(self, name):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+        return path
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root)
+            for name in names
+        )
+
+    def collect(self, *args):
+        call_command(
+            'collect_media_garbage', '--min-age=0', '--batch-size=2',
+            *args, stdout=StringIO(),
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        """Пробный запуск ничего не удаляет."""
+        files = self.files()
+        self.collect('--dry-run')
+        self.assertEqual(self.files(), files)
+
+    def test_orphans_deleted_referenced_kept(self):
+        """Удаляются только файлы без ссылок, миниатюры поста остаются."""
+        files = self.files()
+        self.collect()
+        self.assertFalse(os.path.exists(self.orphan_image))
+        self.assertFalse(os.path.exists(self.orphan_thumbnail))
+        self.assertEqual(
+            self.files(),
+            [name for name in files
+             if name not in ('posts/aa/bb/orphan.gif',
+                             'cache/aa/bb/orphan.jpg')],
+        )
+        self.assertIn(self.post.image.name, self.files())
+        self.assertTrue(
+            any(name.startswith('cache/') for name in self.files())
+        )
+
+    def test_fresh_files_are_kept(self):
+        """Файлы моложе --min-age не удаляются."""
+        call_command(
+            'collect_media_garbage', '--min-age=3600', stdout=StringIO()
+        )
+        self.assertTrue(os.path.exists(self.orphan_image))
+        self.assertTrue(os.path.exists(self.orphan_thumbnail))
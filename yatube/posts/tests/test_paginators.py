@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, Group
+from ..paginators import CachedCountPaginator, CursorPaginator
+
+User = get_user_model()
+QUANTITY_OF_TEST_POSTS = 25
+POSTS_PER_PAGE = 10
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост #{i}', author=cls.user, group=cls.group)
+            for i in range(QUANTITY_OF_TEST_POSTS)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, cursor=None):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        return paginator.get_cursor_page(cursor)
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        """Переход по курсорам отдаёт все посты по порядку без повторов."""
+        seen = []
+        page = self.walk()
+        while True:
+            seen.extend(post.pk for post in page)
+            if page.next_cursor is None:
+                break
+            page = self.walk(page.next_cursor)
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу целиком."""
+        first = self.walk()
+        second = self.walk(first.next_cursor)
+        back = self.walk(second.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first]
+        )
+        self.assertIsNone(first.previous_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        page = self.walk('не-курсор')
+        self.assertEqual(
+            [post.pk for post in page], self.expected[:POSTS_PER_PAGE]
+        )
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET."""
+        first = self.walk()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:index') + f'?cursor={first.next_cursor}'
+            )
+        for query in queries.captured_queries:
+            sql = query['sql'].upper()
+            if 'POSTS_POST' in sql:
+                self.assertNotIn('COUNT(', sql)
+                self.assertNotIn('OFFSET', sql)
+
+    def test_page_links_still_work(self):
+        """Старые ссылки ?page=N продолжают работать."""
+        response = self.client.get(reverse('posts:index') + '?page=3')
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[2 * POSTS_PER_PAGE:],
+        )
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Тестовый пост #{i}', author=cls.user, group=cls.group
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def count(self, scope, queryset=None):
+        if queryset is None:
+            queryset = Post.objects.all()
+        paginator = CachedCountPaginator(
+            queryset, POSTS_PER_PAGE, count_scope=scope
+        )
+        return paginator.count
+
+    def test_count_is_cached(self):
+        """Повторный подсчёт берётся из кэша без COUNT(*)."""
+        self.assertEqual(self.count('all'), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count('all'), 3)
+
+    def test_counts_follow_post_writes(self):
+        """Создание, удаление и перенос поста сдвигают счётчики."""
+        group_posts = Post.objects.filter(group=self.group)
+        other_posts = Post.objects.filter(group=self.other_group)
+        self.count('all')
+        self.count(f'group:{self.group.pk}', group_posts)
+        self.count(f'group:{self.other_group.pk}', other_posts)
+        Post.objects.create(text='Новый', author=self.user, group=self.group)
+        self.posts[0].delete()
+        moved = Post.objects.get(pk=self.posts[1].pk)
+        moved.group = self.other_group
+        moved.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count('all'), 3)
+            self.assertEqual(
+                self.count(f'group:{self.group.pk}', group_posts), 2
+            )
+            self.assertEqual(
+                self.count(f'group:{self.other_group.pk}', other_posts), 1
+            )
+
+    @override_settings(POSTS_COUNT_ESTIMATE_THRESHOLD=0)
+    def test_global_count_falls_back_to_estimate(self):
+        """Для всей ленты выше порога используется оценка по ключам."""
+        Post.objects.filter(pk=self.posts[1].pk).delete()
+        self.assertEqual(self.count('all'), 3)
+        self.assertEqual(self.count(f'author:{self.user.pk}'), 2)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Group, Post
+from ..templatetags.post_cards import post_cards
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def cards(self):
+        return post_cards(
+            Post.objects.select_related('author', 'group'), 'feed'
+        )
+
+    def test_cards_are_served_from_cache(self):
+        """Повторная отрисовка карточек не рендерит шаблон заново."""
+        first = self.cards()
+        with self.assertTemplateNotUsed('posts/includes/post_card.html'):
+            self.assertEqual(self.cards(), first)
+
+    def test_card_changes_with_post_author_and_group(self):
+        """Правка поста, имени автора или группы обновляет карточку."""
+        self.assertIn('Лев Толстой', self.cards()[0])
+        Post.objects.update(text='Исправленный пост')
+        self.assertIn('Исправленный пост', self.cards()[0])
+        User.objects.filter(pk=self.user.pk).update(first_name='Алексей')
+        self.assertIn('Алексей Толстой', self.cards()[0])
+        Group.objects.filter(pk=self.group.pk).update(slug='new-slug')
+        self.assertIn('/group/new-slug/', self.cards()[0])
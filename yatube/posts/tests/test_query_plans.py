@@ -0,0 +1,102 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import CursorPaginator
+
+User = get_user_model()
+# Полный проход по таблице без индекса (до SQLite 3.36 — «SCAN TABLE t»)
+# и досортировка результата
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Проход по результату подзапроса, план которого проверяется отдельно
+COROUTINE = 'CO-ROUTINE '
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост #{i}'
+            )
+            for i in range(15)
+        ]
+        for i in range(3):
+            Comment.objects.create(
+                author=cls.user, post=cls.posts[0], text=f'Комментарий #{i}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def urls(self):
+        cursor = CursorPaginator(Post.objects.all(), 10).get_cursor_page()
+        return [
+            reverse('posts:index'),
+            reverse('posts:index') + f'?cursor={cursor.next_cursor}',
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.posts[0].pk]),
+            reverse('posts:post_comments', args=[self.posts[0].pk]),
+            reverse('posts:follow_index'),
+        ]
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, urls):
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                steps = self.plan(sql)
+                coroutines = {
+                    f'SCAN {step[len(COROUTINE):]}' for step in steps
+                    if step.startswith(COROUTINE)
+                }
+                for step in steps:
+                    if step in coroutines:
+                        continue
+                    with self.subTest(url=url, sql=sql, step=step):
+                        self.assertNotRegex(step, FULL_SCAN_RE)
+                        self.assertNotIn(TEMP_SORT, step)
+
+    def test_views_use_indexes(self):
+        """Запросы страниц не читают таблицы целиком и не сортируют."""
+        self.assert_indexed(self.urls())
+
+    def test_follow_feed_engines_use_indexes(self):
+        """Движки ленты подписок обходятся индексами.
+
+        Движок 'sql' не проверяется: соединение с подписками по многим
+        авторам нельзя получить уже отсортированным из одного индекса.
+        """
+        for engine in ('timeline', 'merge'):
+            with self.settings(FOLLOW_FEED_ENGINE=engine):
+                self.assert_indexed([reverse('posts:follow_index')])
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.utils import ConnectionHandler
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db import SNAPSHOT_TABLE, copy_database
+from core.routers import use_replicas
+
+from ..models import AuthorStats, Group, Post
+from ..stats import stats_for
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class LaggingReplicaTests(TransactionTestCase):
+    """Реплика — снимок default, сделанный до последних записей."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug'
+        )
+        self.old_post = Post.objects.create(
+            author=self.author, group=self.group, text='Старый пост'
+        )
+        # Счётчиков автора на реплике ещё нет
+        AuthorStats.objects.filter(user=self.author).delete()
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'db.replica.sqlite3')
+        copy_database(connections['default'].settings_dict['NAME'], path)
+        replica = ConnectionHandler({'default': {
+            **connections['default'].settings_dict, 'NAME': path,
+        }})['default']
+        self.primary_replica = connections['replica']
+        connections['replica'] = replica
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.client = Client()
+
+    def tearDown(self):
+        connections['replica'].close()
+        connections['replica'] = self.primary_replica
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_cached_pages_read_primary(self):
+        """Страницы, изменённые после снимка, читаются из default."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertContains(response, 'Свежий пост')
+                etag = response['ETag']
+                response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_pages_read_replica(self):
+        """Страницы, не менявшиеся после снимка, читаются с реплики."""
+        # update() не отправляет сигналов, и область группы остаётся
+        # старше снимка: правка видна только в default
+        Post.objects.filter(pk=self.old_post.pk).update(text='Правка')
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug])
+        )
+        self.assertContains(response, 'Старый пост')
+        self.assertNotContains(response, 'Правка')
+
+    def test_unknown_snapshot_reads_primary(self):
+        """Без записанного времени снимка реплика считается отстающей."""
+        with connections['replica'].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SNAPSHOT_TABLE}')
+        Post.objects.filter(pk=self.old_post.pk).update(text='Правка')
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug])
+        )
+        self.assertContains(response, 'Правка')
+
+    def test_stats_created_on_primary(self):
+        """Счётчики, которых нет на реплике, читаются из default."""
+        with use_replicas():
+            author = User.objects.get(pk=self.author.pk)
+            self.assertFalse(AuthorStats.objects.filter(
+                user=author
+            ).exists())
+            self.assertEqual(stats_for(author).posts_count, 2)
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count, 2)
@@ -0,0 +1,105 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 есть только в SQLite')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Котики и снова котики'
+        )
+        cls.dogs = Post.objects.create(author=cls.author, text='Про собак')
+        cls.weather = Post.objects.create(author=cls.author, text='Погода')
+        Comment.objects.create(
+            author=cls.author, post=cls.weather, text='А у меня котик'
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response, list(response.context['page_obj'])
+
+    def test_ranked_by_post_text_then_comments(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        _, posts = self.search('котик')
+        self.assertEqual(posts, [self.cats, self.weather])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры обновляют индекс при правке и удалении."""
+        post = Post.objects.get(pk=self.dogs.pk)
+        post.text = 'Про енотов'
+        post.save()
+        self.assertEqual(self.search('собак')[1], [])
+        self.assertEqual(self.search('енотов')[1], [post])
+        post.delete()
+        self.assertEqual(self.search('енотов')[1], [])
+
+    def test_bulk_create_is_indexed(self):
+        """Посты из bulk_create сразу находятся."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Ежи в лесу')
+        ])
+        self.assertEqual(len(self.search('ежи')[1]), 1)
+
+    def test_operators_in_query_are_text(self):
+        """Кавычки и операторы FTS5 во вводе не ломают запрос."""
+        response, posts = self.search('"собак OR (* NEAR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posts, [])
+        self.assertEqual(self.search('')[1], [])
+
+    def test_results_are_paginated(self):
+        """Результаты разбиты на страницы, ссылки сохраняют запрос."""
+        for i in range(12):
+            Post.objects.create(author=self.author, text=f'Собака #{i}')
+        response, posts = self.search('собак', page=2)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertEqual(len(posts), 3)
+        self.assertContains(
+            response, '?q=%D1%81%D0%BE%D0%B1%D0%B0%D0%BA&amp;page=1'
+        )
+
+    def test_lost_triggers_are_restored(self):
+        """install() возвращает потерянные триггеры и пересобирает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_au')
+        Post.objects.filter(pk=self.dogs.pk).update(text='Про енотов')
+        call_command('migrate', 'posts', verbosity=0, stdout=StringIO())
+        self.assertEqual(self.search('собак')[1], [])
+        self.assertEqual(self.search('енотов')[1], [self.dogs])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты и комментарии по индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [
+            self.cats
+        ])
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+        Post.objects.create(author=self.author, text='Котики спят')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
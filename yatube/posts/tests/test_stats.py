@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post
+from ..stats import rebuild
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Ещё пост')
+        Comment.objects.create(author=self.user, post=post, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).comments_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).comments_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Команда reconcile_author_stats исправляет расхождения."""
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=42)
+        call_command('reconcile_author_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_rebuild_recounts_everyone(self):
+        """rebuild() пересчитывает счётчики всех пользователей разом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(author=self.user, post=post, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        AuthorStats.objects.all().update(posts_count=42, comments_count=42)
+        rebuild()
+        author = self.stats(self.author)
+        reader = self.stats(self.user)
+        self.assertEqual(
+            (author.posts_count, author.comments_count,
+             author.followers_count, author.following_count),
+            (1, 0, 1, 0),
+        )
+        self.assertEqual(
+            (reader.posts_count, reader.comments_count,
+             reader.followers_count, reader.following_count),
+            (0, 1, 0, 1),
+        )
+
+    def test_profile_reads_counters(self):
+        """Профиль берёт число постов из счётчика, а не из COUNT(*)."""
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        response = self.client.get(f'/profile/{self.author.username}/')
+        self.assertEqual(response.context['posts_count'], 7)
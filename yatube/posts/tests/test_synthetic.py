@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from statistics import mean
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+)
+from ..search import SearchResults
+from ..synthetic import DatasetGenerator
+
+User = get_user_model()
+
+
+class GenerateDatasetTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def generate(self, *args):
+        call_command(
+            'generate_dataset', '--users=50', '--posts=200', '--groups=3',
+            '--follows=5', '--comments=2', '--batch-size=30',
+            *args, stdout=StringIO(),
+        )
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug', 'text', 'comment_count'
+        ))
+
+    def test_sizes_and_derived_data(self):
+        """Создаётся заданное число строк, производные данные собраны."""
+        self.generate('--images=2', '--image-ratio=0.5')
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            200,
+        )
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comment_count, post.comments.count())
+        self.assertEqual(
+            Comment.objects.count(),
+            sum(Post.objects.values_list('comment_count', flat=True)),
+        )
+        # Даты разбросаны по заданному периоду, а не равны времени вставки
+        day_ago = timezone.now() - timedelta(days=1)
+        self.assertTrue(Post.objects.filter(pub_date__lt=day_ago).exists())
+        self.assertTrue(Comment.objects.filter(created__lt=day_ago).exists())
+        image = Post.objects.exclude(image='').first()
+        self.assertEqual(image.image_width, 760)
+        self.assertTrue(image.image.storage.exists(image.image.name))
+        word = post.text.split()[0]
+        self.assertGreater(SearchResults(word).count(), 0)
+
+    def test_same_seed_same_dataset(self):
+        """При одном seed получается тот же набор данных."""
+        self.generate('--seed=7')
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.generate('--seed=7')
+        self.assertEqual(self.snapshot(), first)
+
+    def test_popular_authors_have_most_followers(self):
+        """Подписки распределены по степенному закону."""
+        self.generate()
+        followers = Counter(
+            Follow.objects.values_list('author__username', flat=True)
+        )
+        first = User.objects.order_by('pk').first().username
+        self.assertEqual(followers.most_common(1)[0][0], first)
+
+    def test_pareto_keeps_mean(self):
+        """Округление не занижает заданное среднее."""
+        generator = DatasetGenerator(users=1, posts=0)
+        self.assertAlmostEqual(
+            mean(generator.pareto(3) for _ in range(100000)), 3, delta=0.15
+        )
+
+    def test_users_get_wanted_number_of_follows(self):
+        """Каждый получает столько разных подписок, сколько выпало."""
+        generator = DatasetGenerator(users=50, posts=0, groups=0)
+        with mock.patch.object(generator, 'pareto', return_value=30):
+            generator.generate()
+        self.assertEqual(
+            set(Counter(
+                Follow.objects.values_list('user_id', flat=True)
+            ).values()),
+            {30},
+        )
@@ -0,0 +1,200 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails, views
+from ..models import Post
+from ..thumbnails import (
+    process_image, resolve_srcsets, resolve_thumbnails, variant_formats
+)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class EagerThumbnailsTests(TransactionTestCase):
+    def setUp(self):
+        # Кэш KV-хранилища sorl переживает очистку базы между тестами
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def registered_thumbnails(self, post):
+        source = ImageFile(post.image)
+        return default.kvstore._get(source.key, identity='thumbnails') or []
+
+    def create_post(self):
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        })
+        return Post.objects.get(text='Пост с картинкой')
+
+    def index_posts(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        return list(response.context['page_obj'])
+
+    def test_upload_generates_thumbnails_only(self):
+        """Без пула загрузка создаёт миниатюры, но не варианты srcset."""
+        post = self.create_post()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(
+            len(self.registered_thumbnails(post)),
+            len(settings.POST_THUMBNAIL_SIZES),
+        )
+        self.assertNotIn(post.pk, resolve_srcsets([post]))
+
+    def test_worker_generates_variants(self):
+        """Пул после публикации создаёт и варианты srcset."""
+        with mock.patch.object(views, 'schedule_thumbnails'):
+            post = self.create_post()
+        process_image(post.image.name)
+        self.assertIn(post.pk, resolve_srcsets([post]))
+
+    def test_post_listed_after_thumbnails(self):
+        """Пост попадает в ленту, когда пул создал все миниатюры."""
+        with mock.patch.object(views, 'schedule_thumbnails'):
+            post = self.create_post()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertEqual(self.registered_thumbnails(post), [])
+        self.assertNotIn(post, self.index_posts())
+        process_image(post.image.name, variants=False)
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(
+            len(self.registered_thumbnails(post)),
+            len(settings.POST_THUMBNAIL_SIZES),
+        )
+        self.assertIn(post, self.index_posts())
+
+    def test_failed_thumbnails_keep_post_hidden(self):
+        """Пост без миниатюр не попадает в ленту."""
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail', side_effect=OSError
+        ):
+            post = self.create_post()
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_ready)
+        self.assertNotIn(post, self.index_posts())
+
+    def test_edit_keeps_published_post(self):
+        """Правка текста не прячет пост, опубликованный пулом."""
+        with mock.patch.object(views, 'schedule_thumbnails'):
+            post = self.create_post()
+        stale = Post.objects.get(pk=post.pk)
+        process_image(post.image.name)
+        stale.text = 'Правка'
+        stale.save()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResolveThumbnailsTests(TransactionTestCase):
+    def setUp(self):
+        # Кэш KV-хранилища sorl переживает очистку базы между тестами
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        for i in range(3):
+            self.authorized_client.post(reverse('posts:post_create'), data={
+                'text': f'Пост с картинкой #{i}',
+                'image': SimpleUploadedFile(
+                    f'small{i}.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            })
+        Post.objects.create(author=self.user, text='Пост без картинки')
+        # Без пула варианты srcset создаёт только команда
+        call_command('generate_image_variants', stdout=StringIO())
+        self.posts = list(Post.objects.all())
+        cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_page_resolved_with_single_lookup(self):
+        """Миниатюры страницы находятся одним запросом к KV-хранилищу."""
+        with self.assertNumQueries(1):
+            thumbnails = resolve_thumbnails(self.posts)
+        with self.assertNumQueries(0):
+            resolve_thumbnails(self.posts)
+        geometry, options = settings.POST_THUMBNAIL_SIZES['card']
+        for post in self.posts:
+            if not post.image:
+                self.assertNotIn(post.pk, thumbnails)
+                continue
+            expected = get_thumbnail(post.image, geometry, **options)
+            self.assertEqual(thumbnails[post.pk].url, expected.url)
+            self.assertEqual(thumbnails[post.pk].size, expected.size)
+
+    def test_listing_gets_ready_thumbnails(self):
+        """Карточка получает готовый адрес и размеры миниатюры."""
+        geometry, options = settings.POST_THUMBNAIL_SIZES['card']
+        post = Post.objects.exclude(image='').first()
+        expected = get_thumbnail(post.image, geometry, **options)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'<img src="{expected.url}" width="{expected.width}" '
+            f'height="{expected.height}"',
+        )
+
+    def test_listing_gets_srcset_of_ready_variants(self):
+        """Карточка получает srcset из заранее созданных вариантов."""
+        post = Post.objects.exclude(image='').first()
+        srcset = resolve_srcsets([post])[post.pk]
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, f'srcset="{srcset["srcset"]}"')
+        self.assertEqual(
+            [source['type'] for source in srcset['sources']],
+            [f'image/{image_format.lower()}'
+             for image_format in variant_formats()],
+        )
+
+    def test_srcset_never_generated_at_request_time(self):
+        """Недостающие варианты не создаются во время запроса."""
+        post = Post.objects.exclude(image='').first()
+        default.kvstore.delete_thumbnails(ImageFile(post.image))
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertNotIn(post.pk, resolve_srcsets([post]))
+
+    @override_settings(POST_IMAGE_VARIANT_FORMATS=['AVIF', 'WEBP'])
+    def test_unsupported_formats_are_skipped(self):
+        """Форматы, неизвестные sorl или этой сборке Pillow, пропускаются."""
+        self.assertNotIn('AVIF', variant_formats())
+        self.assertEqual(
+            'WEBP' in variant_formats(), features.check('webp')
+        )
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост'
+        )
+
+    def timeline_posts(self):
+        return set(
+            TimelineEntry.objects.filter(user=self.user).values_list(
+                'post_id', flat=True)
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.timeline_posts(), {self.old_post.pk})
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            self.timeline_posts(), {self.old_post.pk, new_post.pk}
+        )
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertEqual(self.timeline_posts(), set())
+
+    def test_large_batches_are_inserted(self):
+        """Пачки крупнее предела SQLite на один INSERT не ломают запись."""
+        User.objects.bulk_create(
+            User(username=f'follower{i}') for i in range(600)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=self.author)
+            for follower in User.objects.filter(username__startswith='fol')
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(600)
+        )
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.exclude(user=self.user).count(), 600
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(len(self.timeline_posts()), 602)
+
+    def test_rebuild_command_restores_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты с нуля."""
+        Follow.objects.create(user=self.user, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), {self.old_post.pk})
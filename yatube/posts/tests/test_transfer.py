@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+)
+from ..search import SearchResults
+
+User = get_user_model()
+OLD_DATE = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=group, text='Пост про котиков'
+        )
+        Post.objects.filter(pk=self.post.pk).update(pub_date=OLD_DATE)
+        Comment.objects.create(
+            author=self.reader, post=self.post, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self):
+        call_command(
+            'export_ndjson', self.path, '--chunk-size=1', stderr=StringIO()
+        )
+
+    def load(self):
+        call_command(
+            'import_ndjson', self.path, '--batch-size=1', stdout=StringIO()
+        )
+
+    def test_round_trip_into_empty_database(self):
+        """Выгрузка и загрузка в пустую базу восстанавливают данные."""
+        self.export()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.load()
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.text, 'Пост про котиков')
+        self.assertEqual(post.pub_date, OLD_DATE)
+        self.assertEqual(post.author.username, 'writer')
+        self.assertEqual(post.group.slug, 'test-slug')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            Comment.objects.get().author.username, 'reader'
+        )
+        follow = Follow.objects.select_related('user', 'author').get()
+        self.assertEqual(
+            (follow.user.username, follow.author.username),
+            ('reader', 'writer'),
+        )
+
+    def test_derived_data_rebuilt(self):
+        """После загрузки пересобраны счётчики, ленты и поисковый индекс."""
+        self.export()
+        self.load()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).comments_count, 2
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(SearchResults('котиков').count(), 2)
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.author, self.author)
+        self.assertEqual(copy.comments.get().author, self.reader)
+
+    def test_export_streams_ndjson(self):
+        """Каждый объект выгружается отдельной строкой JSON."""
+        out = StringIO()
+        call_command('export_ndjson', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith('{"model": "user"'))
+        self.assertIn('"text": "Пост про котиков"', out.getvalue())
@@ -1,19 +1,31 @@
 import shutil
 import tempfile
+from hashlib import sha256
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.urls import reverse
 from django import forms
 
-from ..models import Post, Group, Follow
+from ..caching import get_generations
+from ..models import Comment, Follow, Group, Post
+from ..thumbnails import generate_thumbnails
 
 User = get_user_model()
 QUANTITY_OF_TEST_POSTS = 13
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -46,6 +58,8 @@ class PostPagesTests(TestCase):
             group=cls.group,
             image=cls.uploaded
         )
+        digest = sha256(cls.small_gif).hexdigest()
+        cls.image_name = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
 
     def setUp(self):
         self.guest_client = Client()
@@ -92,7 +106,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_author_0, self.user)
         self.assertEqual(post_text_0, 'Тестовый пост #0')
         self.assertEqual(post_group_0, self.group)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.image_name)
 
     def test_group_list_page_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
@@ -107,7 +121,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_author_0, self.user)
         self.assertEqual(post_text_0, 'Тестовый пост #0')
         self.assertEqual(post_group_0, self.group)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.image_name)
 
     def test_profile_page_show_correct_context(self):
         """Шаблон profile сформирован с правильным контекстом."""
@@ -123,7 +137,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_author_0, self.user)
         self.assertEqual(post_text_0, 'Тестовый пост #0')
         self.assertEqual(post_group_0, self.group)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.image_name)
 
     def test_post_detail_page_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
@@ -133,7 +147,7 @@ class PostPagesTests(TestCase):
         post_0 = {response.context['post'].text: 'Тестовый пост #0',
                   response.context['post'].group: self.group,
                   response.context['post'].author: self.user,
-                  response.context['post'].image: 'posts/small.gif'
+                  response.context['post'].image: self.image_name
                   }
         for value, expected in post_0.items():
             self.assertEqual(value, expected)
@@ -205,19 +219,59 @@ class PostPagesTests(TestCase):
             reverse('posts:index')
         )
         first_page = first_responce.content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        second_responce = self.authorized_client.get(reverse('posts:index'))
+        second_page = second_responce.content
+        self.assertEqual(second_page, first_page)
         Post.objects.create(
             author=self.user,
             text='Проверка кэша',
             group=self.group)
-        second_responce = self.authorized_client.get(reverse('posts:index'))
-        second_page = second_responce.content
-        self.assertEqual(second_page, first_page)
-        cache.clear()
-        after_clear_cache_responce = self.authorized_client.get(
+        after_new_post_responce = self.authorized_client.get(
             reverse('posts:index')
         )
-        third_page = after_clear_cache_responce.content
+        third_page = after_new_post_responce.content
         self.assertNotEqual(third_page, first_page)
+        self.assertContains(after_new_post_responce, 'Проверка кэша')
+
+    def test_cache_group_and_profile_pages(self):
+        '''Новый пост сразу виден на закэшированных страницах
+            группы и профиля'''
+        pages = [
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile',
+                    kwargs={'username': f'{self.user.username}'}),
+        ]
+        for page in pages:
+            self.authorized_client.get(page)
+        Post.objects.create(
+            author=self.user,
+            text='Свежий пост',
+            group=self.group)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertContains(response, 'Свежий пост')
+
+    def test_user_save_bumps_pages_only_on_name_change(self):
+        '''Сохранение пользователя сбрасывает страницы, только если
+            изменилось имя; переименование сбрасывает старый и новый
+            профиль'''
+        scopes = [
+            'posts', 'group:test-slug', 'author:auth', 'author:renamed'
+        ]
+        before = get_generations(scopes)
+        User.objects.create_user(username='newcomer')
+        user = User.objects.get(pk=self.user.pk)
+        user.email = 'auth@example.com'
+        user.save()
+        self.assertEqual(get_generations(scopes), before)
+        user.username = 'renamed'
+        user.save()
+        after = get_generations(scopes)
+        for scope, old, new in zip(scopes, before, after):
+            with self.subTest(scope=scope):
+                self.assertNotEqual(new, old)
 
 
 class PaginatorViewsTests(TestCase):
@@ -328,3 +382,170 @@ class FollowTests(TestCase):
         unfollower_page = response_unfollower.context['page_obj']
         self.assertIn(new_post_following, follower_page)
         self.assertNotIn(new_post_following, unfollower_page)
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и подписка на себя не создают записей."""
+        url = reverse(
+            'posts:profile_follow', kwargs={'username': self.user2.username}
+        )
+        response = self.authorized_client.get(url)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[self.user2.username])
+        )
+        self.authorized_client2.get(url)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_follow_constraints(self):
+        """База не допускает повторных подписок и подписок на себя."""
+        for user, author in [(self.user, self.user2), (self.user, self.user)]:
+            with self.subTest(author=author.username):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    Follow.objects.create(user=user, author=author)
+
+    def test_follow_json_response(self):
+        """Скрипт получает JSON вместо перехода в профиль."""
+        for name, following in [
+            ('posts:profile_follow', True),
+            ('posts:profile_unfollow', False),
+        ]:
+            response = self.authorized_client.get(
+                reverse(name, kwargs={'username': self.user3.username}),
+                HTTP_ACCEPT='application/json',
+            )
+            self.assertEqual(response.json(), {
+                'author': self.user3.username, 'following': following,
+            })
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ListingQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'auth{i}') for i in range(10)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def query_counts(self):
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth0'}),
+            reverse('posts:follow_index'),
+        ]
+        counts = []
+        for page in pages:
+            cache.clear()
+            response = self.authorized_client.get(page)
+            counts.append(int(response['X-Query-Count']))
+        return counts
+
+    def test_listing_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с числом постов."""
+        Post.objects.create(
+            author=self.authors[0], text='Пост', group=self.group
+        )
+        single = self.query_counts()
+        for author in self.authors:
+            Post.objects.create(author=author, text='Пост', group=self.group)
+        self.assertEqual(self.query_counts(), single)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Все страницы укладываются в QUERY_BUDGETS при QUERY_BUDGET_STRICT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Текст'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост #{i}',
+                image=SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            )
+        cls.post = Post.objects.latest('pk')
+        # В кэше KV-хранилища sorl могут остаться записи других тестов
+        cache.clear()
+        generate_thumbnails(cls.post.image.name)
+        for i in range(3):
+            Comment.objects.create(
+                author=cls.reader, post=cls.post, text=f'Комментарий #{i}'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def test_pages_fit_budgets(self):
+        """Страницы с картинками и комментариями не превышают лимиты."""
+        post_id = self.post.pk
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:profile', args=[self.reader.username]),
+            reverse('posts:post_detail', args=[post_id]),
+            reverse('posts:post_comments', args=[post_id]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:post_create'),
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_writes_fit_budgets(self):
+        """Запись поста, комментария и подписки не превышает лимиты."""
+        author = self.author.username
+        own = Post.objects.create(author=self.reader, text='Свой пост')
+        writes = [
+            (reverse('posts:post_create'), {
+                'text': 'Новый пост', 'group': self.group.pk,
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF + b'1', content_type='image/gif'
+                ),
+            }),
+            (reverse('posts:post_edit', args=[own.pk]), {
+                'text': 'Изменённый пост',
+                'image': SimpleUploadedFile(
+                    'edit.gif', SMALL_GIF + b'2', content_type='image/gif'
+                ),
+            }),
+            (reverse('posts:add_comment', args=[self.post.pk]), {
+                'text': 'Новый комментарий',
+            }),
+            (reverse('posts:profile_unfollow', args=[author]), {}),
+            (reverse('posts:profile_follow', args=[author]), {}),
+        ]
+        for url, data in writes:
+            with self.subTest(url=url):
+                response = self.client.post(url, data)
+                self.assertEqual(response.status_code, 302)
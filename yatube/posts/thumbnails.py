@@ -0,0 +1,317 @@
+"""Заранее создаёт миниатюры картинок постов.
+
+Миниатюры всех размеров из POST_THUMBNAIL_SIZES строятся в фоновом пуле
+потоков сразу после сохранения картинки и записываются в KV-хранилище
+sorl. Тег {% thumbnail %} в шаблонах с той же геометрией и опциями
+находит их там и не тратит время запроса на декодирование и сжатие.
+
+Пост с новой картинкой сохраняется с thumbnails_ready = False и не
+выводится в лентах, пока пул не создаст все миниатюры: только после
+этого publish_posts() показывает его. Варианты карточки для srcset
+(ширины POST_IMAGE_VARIANT_WIDTHS в форматах POST_IMAGE_VARIANT_FORMATS)
+пул создаёт уже после публикации. Без пула (THUMBNAIL_WORKERS = 0)
+миниатюры создаются в запросе, а варианты — только командой
+generate_image_variants.
+
+Для списков постов resolve_thumbnails() находит миниатюры целой
+страницы одним get_many из кэша KV-хранилища и одним запросом к его
+таблице вместо отдельного поиска и проверки файла на каждый пост.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.parsers import parse_geometry
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import blobs, feeds
+from .caching import bump_generation, page_scopes
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def generate_thumbnails(image_name, sizes=None):
+    """Создаёт миниатюры картинки и регистрирует их.
+
+    sizes — пары (geometry, options), по умолчанию POST_THUMBNAIL_SIZES.
+    Исходник открывается через хранилище поля Post.image: от него
+    зависит ключ, под которым sorl ищет миниатюры картинки поста.
+    Возвращает False, если хотя бы одну миниатюру создать не удалось.
+    """
+    if sizes is None:
+        sizes = settings.POST_THUMBNAIL_SIZES.values()
+    try:
+        source = ImageFile(image_name, blobs.storage())
+        for geometry, options in sizes:
+            get_thumbnail(source, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+        return False
+    return True
+
+
+def publish_posts(image_name):
+    """Показывает в лентах посты, миниатюры картинки которых готовы.
+
+    Условие на картинку в UPDATE не даёт показать пост, картинку которого
+    успели заменить, пока создавались миниатюры.
+    """
+    pending = Post.objects.filter(image=image_name, thumbnails_ready=False)
+    posts = list(pending.values_list('pk', 'author_id', 'group_id'))
+    if not posts:
+        return
+    pending.filter(pk__in=[pk for pk, _, _ in posts]).update(
+        thumbnails_ready=True
+    )
+    author_ids = {author_id for _, author_id, _ in posts}
+    bump_generation(
+        'posts', *[f'post:{pk}' for pk, _, _ in posts],
+        *page_scopes(author_ids, {group_id for _, _, group_id in posts})
+    )
+    for author_id in author_ids:
+        feeds.invalidate_author_posts(author_id)
+
+
+def process_image(image_name, variants=True):
+    """Создаёт миниатюры картинки, публикует посты с ней, затем варианты."""
+    if generate_thumbnails(image_name):
+        publish_posts(image_name)
+    if variants:
+        generate_thumbnails(image_name, variant_sizes().values())
+
+
+def _run_in_worker(image_name):
+    try:
+        process_image(image_name)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(image):
+    """Ставит картинку в очередь после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу в текущем потоке,
+    а варианты srcset остаются команде generate_image_variants.
+    """
+    if not image:
+        return
+    name = image.name
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: process_image(name, variants=False))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_in_worker, name)
+    )
+
+
+def image_box(post, size='card'):
+    """Размер миниатюры поста по размерам картинки, сохранённым в Post.
+
+    Повторяет масштабирование и обрезку sorl, поэтому шаблон выводит
+    блок нужного размера, не открывая файл и не читая KV-хранилище.
+    None, если размеры картинки ещё не посчитаны.
+    """
+    width, height = post.image_width, post.image_height
+    if not post.image or not width or not height:
+        return None
+    geometry, options = settings.POST_THUMBNAIL_SIZES[size]
+    box_width, box_height = parse_geometry(geometry, width / height)
+    crop = options.get('crop')
+    upscale = options.get('upscale', sorl_settings.THUMBNAIL_UPSCALE)
+    factor = (max if crop else min)(box_width / width, box_height / height)
+    if factor < 1 or upscale:
+        width, height = toint(width * factor), toint(height * factor)
+    if crop:
+        width, height = min(width, box_width), min(height, box_height)
+    return {'width': width, 'height': height}
+
+
+def thumbnail_options(source, options):
+    """Опции, дополненные так же, как в ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_key(image, geometry, options):
+    """Ключ KV-хранилища, под которым sorl записывает миниатюру."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, thumbnail_options(source, options)
+    )
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _get_raw_many(keys):
+    """Сырые значения KV-хранилища: один get_many и один запрос к БД."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        if stored:
+            kvstore.cache.set_many(
+                stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+        values.update(stored)
+    return {
+        key: value for key, value in values.items()
+        if isinstance(value, str)
+    }
+
+
+def stored_thumbnails(posts, sizes):
+    """Уже созданные миниатюры: (pk поста, имя размера) -> ImageFile.
+
+    sizes — словарь имя -> (geometry, options). Ключи всех постов и
+    размеров ищутся одним get_many и одним запросом к таблице хранилища.
+    """
+    keys = {
+        (post.pk, name): thumbnail_key(post.image, geometry, options)
+        for post in posts if post.image
+        for name, (geometry, options) in sizes.items()
+    }
+    stored = _get_raw_many(list(set(keys.values())))
+    return {
+        ident: deserialize_image_file(stored[key])
+        for ident, key in keys.items() if key in stored
+    }
+
+
+def resolve_thumbnails(posts, size='card'):
+    """Миниатюры картинок постов: словарь pk поста -> ImageFile.
+
+    Миниатюры, которых ещё нет в хранилище, создаются по одной через
+    get_thumbnail, как это сделал бы тег {% thumbnail %}.
+    """
+    geometry, options = settings.POST_THUMBNAIL_SIZES[size]
+    stored = stored_thumbnails(posts, {size: (geometry, options)})
+    thumbnails = {}
+    for post in posts:
+        if not post.image:
+            continue
+        if (post.pk, size) in stored:
+            thumbnails[post.pk] = stored[post.pk, size]
+            continue
+        try:
+            thumbnail = get_thumbnail(post.image, geometry, **options)
+        except Exception:
+            logger.exception(
+                'Не удалось получить миниатюру для %s', post.image
+            )
+            continue
+        if thumbnail:
+            thumbnails[post.pk] = thumbnail
+    return thumbnails
+
+
+def variant_formats():
+    """Современные форматы из настроек, которые умеют Pillow и sorl."""
+    return [
+        image_format for image_format in settings.POST_IMAGE_VARIANT_FORMATS
+        if image_format in EXTENSIONS and features.check(image_format.lower())
+    ]
+
+
+def variant_sizes():
+    """Варианты карточки по ширине: (формат, ширина) -> размер.
+
+    Формат None — формат миниатюр по умолчанию для <img srcset>.
+    Пропорции кадра берутся из размера 'card'.
+    """
+    geometry, options = settings.POST_THUMBNAIL_SIZES['card']
+    card_width, card_height = map(int, geometry.split('x'))
+    sizes = {}
+    for image_format in [None] + variant_formats():
+        for width in settings.POST_IMAGE_VARIANT_WIDTHS:
+            variant_options = dict(options)
+            if image_format:
+                variant_options['format'] = image_format
+            height = round(card_height * width / card_width)
+            sizes[image_format, width] = (f'{width}x{height}', variant_options)
+    return sizes
+
+
+def _srcset(thumbnails):
+    seen = set()
+    candidates = []
+    for thumbnail in sorted(thumbnails, key=lambda image: image.width):
+        if thumbnail.width not in seen:
+            seen.add(thumbnail.width)
+            candidates.append(f'{thumbnail.url} {thumbnail.width}w')
+    return ', '.join(candidates)
+
+
+def resolve_srcsets(posts):
+    """srcset карточек постов из уже созданных вариантов.
+
+    Возвращает словарь pk поста -> {'srcset', 'sources'}, где sources —
+    список {'type', 'srcset'} для <source> современных форматов. Варианты
+    не создаются во время запроса: пост, варианты которого ещё не готовы,
+    в словарь не попадает.
+    """
+    sizes = variant_sizes()
+    stored = stored_thumbnails(posts, sizes)
+    srcsets = {}
+    for post in posts:
+        if not post.image:
+            continue
+        by_format = {}
+        for image_format, width in sizes:
+            thumbnail = stored.get((post.pk, (image_format, width)))
+            if thumbnail is None:
+                break
+            by_format.setdefault(image_format, []).append(thumbnail)
+        else:
+            srcsets[post.pk] = {
+                'srcset': _srcset(by_format.pop(None, [])),
+                'sources': [
+                    {
+                        'type': f'image/{image_format.lower()}',
+                        'srcset': _srcset(thumbnails),
+                    }
+                    for image_format, thumbnails in by_format.items()
+                ],
+            }
+    return srcsets
@@ -0,0 +1,103 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждый новый пост сразу раскладывается в ленты подписчиков автора,
+поэтому чтение /follow/ — это выборка по индексу (user, -pub_date)
+из собственной ленты пользователя без соединения с posts_follow.
+"""
+from django.db import connection
+
+from .models import Follow, Post, TimelineEntry
+from .paginators import CursorPaginator
+
+BATCH_SIZE = 1000
+
+
+def _insert(entries):
+    # Размер пачки INSERT выбирает бэкенд: у SQLite свой предел
+    # на число строк в одном запросе
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            _insert(batch)
+            batch = []
+    _insert(batch)
+
+
+def backfill_follow(user_id, author_id):
+    """Переносит в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    batch = []
+    for post_id, pub_date in posts.iterator():
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            _insert(batch)
+            batch = []
+    _insert(batch)
+
+
+def trim_follow(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_timelines():
+    """Пересобирает все ленты с нуля по таблице подписок.
+
+    Ленты заполняются одним INSERT ... SELECT по соединению подписок
+    с постами, без передачи строк через Python.
+    """
+    TimelineEntry.objects.all().delete()
+    entries = Post.objects.order_by().filter(
+        author__following__isnull=False
+    ).values_list(
+        'author__following__user_id', 'pk', 'author_id', 'pub_date'
+    )
+    sql, params = entries.query.sql_with_params()
+    table = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, post_id, author_id, pub_date) '
+            f'{sql}',
+            params,
+        )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор по записям ленты, отдающий сами посты."""
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-post_id'), **kwargs):
+        super().__init__(object_list, per_page, ordering=ordering, **kwargs)
+
+    def _get_page(self, object_list, *args, **kwargs):
+        posts = [entry.post for entry in object_list]
+        return super()._get_page(posts, *args, **kwargs)
+
+
+def timeline_for(user):
+    return TimelineEntry.objects.filter(
+        user=user, post__thumbnails_ready=True
+    ).select_related(
+        'post__author', 'post__group'
+    )
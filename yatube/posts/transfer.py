@@ -0,0 +1,189 @@
+"""Потоковые выгрузка и загрузка данных в NDJSON.
+
+Каждая строка — один объект: {"model": "post", "pk": 1, ...поля}.
+Модели выгружаются в порядке MODELS, так что объект в файле всегда
+идёт после тех, на кого ссылается. Файлы картинок не переносятся,
+в выгрузке только их имена и метаданные.
+
+Загрузка читает файл построчно и пишет пачками через bulk_create,
+поэтому память не зависит от размера файла:
+
+* новые объекты получают pk = старый pk + наибольший pk в базе, так
+  что таблица соответствия для постов и комментариев не нужна;
+* пользователи и группы, уже существующие в базе (по username и slug),
+  не создаются — ссылки на них переводятся на найденные объекты;
+* сигналы при bulk_create не срабатывают, поэтому счётчики, ленты,
+  ссылки на файлы и поисковый индекс пересобираются один раз в конце
+  запросами над целыми таблицами, а не построчно.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import blobs, comments, search, stats
+from .models import Comment, Follow, Group, Post
+from .timeline import rebuild_timelines
+
+User = get_user_model()
+
+MODELS = {
+    'user': (User, [
+        'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+    ]),
+    'group': (Group, ['title', 'slug', 'description']),
+    'post': (Post, [
+        'text', 'pub_date', 'author_id', 'group_id', 'image',
+        'image_width', 'image_height', 'image_size', 'image_placeholder',
+    ]),
+    'comment': (Comment, ['author_id', 'post_id', 'text', 'created']),
+    'follow': (Follow, ['user_id', 'author_id']),
+}
+# Ссылки записей на другие модели выгрузки
+REFERENCES = {
+    'author_id': 'user',
+    'user_id': 'user',
+    'group_id': 'group',
+    'post_id': 'post',
+}
+# Модели, даты которых заполняет auto_now_add
+DATED = {'post', 'comment'}
+# Пользователи и группы, которые уже могут быть в базе
+NATURAL_KEYS = {
+    'user': 'username',
+    'group': 'slug',
+}
+
+
+def export(stream, chunk_size=2000):
+    """Пишет все объекты в stream, возвращает их число по моделям."""
+    counts = {}
+    for name, (model, fields) in MODELS.items():
+        rows = model.objects.order_by('pk').values('pk', *fields)
+        counts[name] = 0
+        for row in rows.iterator(chunk_size=chunk_size):
+            stream.write(json.dumps(
+                {'model': name, **row}, cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+            ) + '\n')
+            counts[name] += 1
+    return counts
+
+
+def insert_as_is(model, objects):
+    """bulk_create, который пишет значения полей без изменений.
+
+    auto_now_add заменяет pub_date и created текущим временем при любой
+    вставке через ORM; raw-вставка, как у loaddata, сохраняет даты,
+    переданные явно.
+    """
+    fields = model._meta.concrete_fields
+    size = max(connection.ops.bulk_batch_size(fields, objects), 1)
+    for start in range(0, len(objects), size):
+        model.objects._insert(
+            objects[start:start + size], fields=fields, raw=True
+        )
+
+
+def rebuild_derived(timelines=True):
+    """Пересобирает всё, что при обычной записи обновляют сигналы."""
+    comments.recount()
+    stats.rebuild()
+    if timelines:
+        rebuild_timelines()
+    blobs.recount()
+    search.install(rebuild=True)
+    # Поколения страниц, счётчики пагинаторов и карточки — всё устарело
+    cache.clear()
+
+
+class Importer:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.offsets = {
+            name: model.objects.aggregate(top=Max('pk'))['top'] or 0
+            for name, (model, _) in MODELS.items()
+        }
+        self.existing = {name: {} for name in NATURAL_KEYS}
+        self.counts = {name: 0 for name in MODELS}
+        self.model_name = None
+        self.batch = []
+
+    def new_pk(self, name, pk):
+        if pk is None:
+            return None
+        existing = self.existing.get(name, {})
+        return existing.get(pk, pk + self.offsets[name])
+
+    def load(self, lines):
+        """Загружает объекты из строк NDJSON, возвращает их число."""
+        with transaction.atomic():
+            search.drop_triggers()
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['model'] != self.model_name:
+                    self.flush()
+                    self.model_name = record['model']
+                self.batch.append(record)
+                if len(self.batch) >= self.batch_size:
+                    self.flush()
+            self.flush()
+            self.reset_sequences()
+            rebuild_derived()
+        return self.counts
+
+    def flush(self):
+        if not self.batch:
+            return
+        name, records, self.batch = self.model_name, self.batch, []
+        model, fields = MODELS[name]
+        if name in NATURAL_KEYS:
+            records = self.skip_existing(name, records)
+        objects = [self.build(name, model, fields, record)
+                   for record in records]
+        if name == 'follow':
+            objects = [obj for obj in objects if obj.user_id != obj.author_id]
+        if name in DATED:
+            insert_as_is(model, objects)
+        else:
+            model.objects.bulk_create(
+                objects, ignore_conflicts=(name == 'follow')
+            )
+        self.counts[name] += len(objects)
+
+    def skip_existing(self, name, records):
+        """Запоминает объекты, которые уже есть в базе, и убирает их."""
+        model, _ = MODELS[name]
+        key = NATURAL_KEYS[name]
+        found = dict(model.objects.filter(
+            **{f'{key}__in': [record[key] for record in records]}
+        ).values_list(key, 'pk'))
+        fresh = []
+        for record in records:
+            if record[key] in found:
+                self.existing[name][record['pk']] = found[record[key]]
+            else:
+                fresh.append(record)
+        return fresh
+
+    def build(self, name, model, fields, record):
+        values = {field: record.get(field) for field in fields}
+        for field, target in REFERENCES.items():
+            if field in values:
+                values[field] = self.new_pk(target, values[field])
+        return model(pk=self.new_pk(name, record['pk']), **values)
+
+    def reset_sequences(self):
+        # В PostgreSQL последовательности не знают о pk, заданных явно
+        models = [model for model, _ in MODELS.values()]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -1,31 +1,69 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.views.decorators.cache import cache_page
-from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.conf import settings
-from .models import Post, Group, Comment, Follow
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_safe
+from django.utils.http import urlencode
+from .models import Post, Group, Follow
 from .forms import PostForm, CommentForm
+from .caching import cache_page_by_generation, conditional_page
+from .comments import comment_page, serialize
+from .paginators import paginate
+from .feeds import follow_page
+from .search import search_posts
+from .stats import stats_for
+from .thumbnails import schedule_thumbnails
 
 User = get_user_model()
 
 
-@cache_page(20, key_prefix="index_page")
+def index_scopes():
+    return ['posts']
+
+
+def group_scopes(slug):
+    return [f'group:{slug}']
+
+
+def profile_scopes(username):
+    return [f'author:{username}']
+
+
+def post_scopes(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return [f'post:{post_id}']
+    username, slug = post
+    return [f'post:{post_id}', *profile_scopes(username)] + (
+        group_scopes(slug) if slug else []
+    )
+
+
+@conditional_page(index_scopes)
+@cache_page_by_generation(index_scopes, key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.filter(thumbnails_ready=True).select_related(
+        'author', 'group'
+    )
+    page_obj = paginate(request, post_list, count_scope='all')
     context = {'page_obj': page_obj}
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_scopes)
+@cache_page_by_generation(group_scopes, key_prefix='group_page')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.groups_posts.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.groups_posts.filter(
+        thumbnails_ready=True
+    ).select_related('author', 'group')
+    page_obj = paginate(request, post_list, count_scope=f'group:{group.pk}')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -33,31 +71,39 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_scopes)
+@cache_page_by_generation(profile_scopes, key_prefix='profile_page')
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts_count = Post.objects.filter(author__username=author).count()
-    post_list = Post.objects.filter(author__username=author)
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    stats = stats_for(author)
+    post_list = author.posts.filter(
+        thumbnails_ready=True
+    ).select_related('author', 'group')
+    page_obj = paginate(
+        request, post_list, count_scope=f'author:{author.pk}'
+    )
     user = request.user
     following = False
     if user.is_authenticated:
         following = Follow.objects.filter(user=user, author=author).exists()
     context = {
         'page_obj': page_obj,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'author': author,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author = User.objects.get(id=post.author_id)
-    comments = Comment.objects.filter(post_id=post_id)
-    posts_count = Post.objects.filter(author__username=author).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    author = post.author
+    comments = comment_page(post, request.GET.get('comments'))
+    posts_count = stats_for(author).posts_count
     form = CommentForm()
     context = {
         'post': post,
@@ -69,6 +115,28 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def wants_json(request):
+    return 'application/json' in request.META.get('HTTP_ACCEPT', '')
+
+
+@require_safe
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post, pk=post_id)
+    comments = comment_page(post, request.GET.get('cursor'))
+    if wants_json(request):
+        return JsonResponse({
+            'comments': [serialize(comment) for comment in comments],
+            'next_cursor': comments.next_cursor,
+        })
+    html = render_to_string(
+        'posts/includes/comments.html',
+        {'post': post, 'comments': comments},
+        request=request,
+    )
+    return HttpResponse(html)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -77,7 +145,9 @@ def post_create(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
+        new_post.thumbnails_ready = not new_post.image
         new_post.save()
+        schedule_thumbnails(new_post.image)
         return redirect(f'/profile/{new_post.author}/')
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -93,7 +163,12 @@ def post_edit(request, post_id):
                         instance=post
                         )
         if form.is_valid():
+            image_changed = 'image' in form.changed_data
+            if image_changed:
+                post.thumbnails_ready = not post.image
             form.save()
+            if image_changed:
+                schedule_thumbnails(post.image)
             return redirect('posts:post_detail', post_id)
         else:
             context = {
@@ -125,25 +200,47 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = follow_page(request)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '')
+    paginator = Paginator(search_posts(query), settings.NUMBER_OF_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def follow_response(request, author, following):
+    """JSON для запросов из скриптов, иначе переход в профиль автора."""
+    if wants_json(request):
+        return JsonResponse(
+            {'author': author.username, 'following': following}
+        )
+    return redirect('posts:profile', author.username)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author != request.user and not (Follow.objects.filter(
-            user=request.user, author=author).exists()):
-        Follow.objects.create(author=author, user=request.user)
-    return render(request, 'posts/index.html')
+    if author != request.user:
+        # Одна вставка: повтор или гонка упираются в уникальность пары
+        try:
+            with transaction.atomic():
+                Follow.objects.create(author=author, user=request.user)
+        except IntegrityError:
+            pass
+    return follow_response(request, author, author != request.user)
 
 
 @login_required
 def profile_unfollow(request, username):
-    user = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=user, user=request.user).delete()
-    return render(request, 'posts/index.html')
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(author=author, user=request.user).delete()
+    return follow_response(request, author, False)
@@ -57,8 +57,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaMiddleware',
 ]
 
+if DEBUG:
+    MIDDLEWARE.insert(0, 'core.middleware.QueryBudgetMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
@@ -92,6 +96,46 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL so reads and writes do not block each
+# other, larger page cache and mmap. Waiting for a busy database needs no
+# pragma: sqlite3 connections already wait 5 seconds (OPTIONS 'timeout').
+# PRAGMAS are applied to every new connection by core.db; connections are
+# kept between requests
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+if not DEBUG:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    })
+
+# Read replica: locally a copy of the SQLite file refreshed by
+# `manage.py replicate_db --interval N`. Reads go to the aliases listed in
+# DATABASE_REPLICAS (see core/routers.py); the list is empty by default.
+# After a request that writes, the user reads from default for
+# REPLICA_PIN_SECONDS, which must exceed the replication interval
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+REPLICA_PIN_COOKIE = 'read_primary'
+
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,10 +178,75 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media serving (see core/media.py): None serves files from Django with
+# sendfile and Range support; 'x-accel-redirect' or 'x-sendfile' hands
+# them to the reverse proxy
+
+MEDIA_OFFLOAD = None
+
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 # Number of selected objects of the Post model
 
 NUMBER_OF_POSTS = 10
 
+# Follow feed engine: 'timeline', 'merge' or 'sql' (see posts/feeds.py)
+
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Length of the cached list of recent post ids per author ('merge' engine)
+
+AUTHOR_POSTS_CACHE_SIZE = 200
+
+# Comments per page on the post page and per chunk of post_comments
+
+COMMENTS_PER_PAGE = 20
+
+# Cached paginator counts (see posts.paginators.CachedCountPaginator)
+
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+
+POSTS_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Rendered post card fragments (see posts/templatetags/post_cards.py)
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Generation-keyed page cache (see posts/caching.py)
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Thumbnails generated on upload by a background pool and resolved in
+# batches for listings (see posts/thumbnails.py); the post detail
+# {% thumbnail %} tag must use the same geometry and options as the
+# 'detail' size
+
+POST_THUMBNAIL_SIZES = {
+    'card': ('760x439', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x639', {'crop': 'center', 'upscale': True}),
+}
+
+THUMBNAIL_WORKERS = 0 if DEBUG else 4
+
+# Width variants of the post card for srcset, built by the thumbnail pool
+# after the post is published or by generate_image_variants. Only formats
+# sorl has a file extension for (JPEG, PNG, GIF, WEBP) and Pillow can
+# encode in this build are used; the default thumbnail format is always
+# generated as the <img> fallback
+
+POST_IMAGE_VARIANT_WIDTHS = [320, 480, 760]
+
+POST_IMAGE_VARIANT_FORMATS = ['WEBP']
+
+POST_IMAGE_SIZES = '(max-width: 760px) 100vw, 760px'
+
+# Full-text search (see posts/search.py): a match in a comment ranks the
+# post lower than the same match in the post text
+
+SEARCH_COMMENT_WEIGHT = 0.5
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -150,8 +259,39 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Per-view query limits checked by core.middleware.QueryBudgetMiddleware.
+# Pages read in a fixed number of queries. Writes also update counters,
+# timelines and image references in signals
+
+QUERY_BUDGET_DEFAULT = 10
+
+QUERY_BUDGETS = {
+    'admin:index': 20,
+    'posts:post_create': 14,
+    'posts:post_edit': 10,
+    'posts:profile_follow': 12,
+    'posts:profile_unfollow': 12,
+}
+
+QUERY_BUDGET_STRICT = False
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Outside of DEBUG all worker processes share one SQLite cache file
+
+if not DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+                'STALE_TIMEOUT': 60,
+                'EARLY_EXPIRATION_BETA': 1.0,
+            },
+        }
+    }